@@ -0,0 +1,66 @@
+"""Add month-partitioned borrow_events log and active_loans
+
+Revision ID: 3c1e8a5d9b27
+Revises: f95bdf4d6f0e
+Create Date: 2026-10-19 13:05:41.582310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e8a5d9b27'
+down_revision = 'f95bdf4d6f0e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    borrow_event_kind = postgresql.ENUM('BORROW', 'RETURN', name='borroweventkind')
+    borrow_event_kind.create(op.get_bind())
+
+    # Monthly partitions are created by app/services/borrow_events.py (run at
+    # startup and on a timer); until then rows land in the default partition
+    op.execute("""
+        CREATE TABLE borrow_events (
+            id bigserial NOT NULL,
+            at timestamp with time zone NOT NULL DEFAULT now(),
+            library_id integer NOT NULL,
+            user_id integer NOT NULL,
+            book_id integer NOT NULL,
+            kind borroweventkind NOT NULL,
+            CONSTRAINT borrow_events_pkey PRIMARY KEY (at, id)
+        ) PARTITION BY RANGE (at)
+    """)
+    op.execute('CREATE TABLE borrow_events_default PARTITION OF borrow_events DEFAULT')
+    op.create_index('ix_borrow_events_user_id_at', 'borrow_events', ['user_id', 'at'], unique=False)
+    op.create_index('ix_borrow_events_book_id_at', 'borrow_events', ['book_id', 'at'], unique=False)
+
+    op.create_table('active_loans',
+    sa.Column('library_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('borrowed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['library_id'], ['libraries.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.PrimaryKeyConstraint('library_id', 'user_id', 'book_id')
+    )
+    op.create_index('ix_active_loans_book_id', 'active_loans', ['book_id'], unique=False)
+
+    # Current loans carry over; borrow_records has no timestamps, so there is
+    # no earlier history to replay into borrow_events
+    op.execute("""
+        INSERT INTO active_loans (library_id, user_id, book_id)
+        SELECT DISTINCT library_id, user_id, book_id FROM borrow_records WHERE delete_entry = false
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_active_loans_book_id', table_name='active_loans')
+    op.drop_table('active_loans')
+    # Drops every attached partition with it; archived ones are left alone
+    op.drop_table('borrow_events')
+    postgresql.ENUM(name='borroweventkind').drop(op.get_bind())
@@ -0,0 +1,90 @@
+"""Move embeddings to a dedicated book_embeddings table
+
+Revision ID: 8087b497deb0
+Revises: 07b4005596b1
+Create Date: 2026-10-19 09:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '8087b497deb0'
+down_revision = '07b4005596b1'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_MODEL = 'text-embedding-004'
+EMBEDDING_DIM = 768
+
+# Same text EmbeddingService.book_text() builds, so the stored hashes match
+BOOK_TEXT_SQL = """
+    concat_ws(
+        ' | ',
+        'Title: ' || title,
+        'Author: ' || author,
+        'Genre: ' || NULLIF(genre, ''),
+        'Summary: ' || NULLIF(summary, '')
+    )
+"""
+
+
+def upgrade() -> None:
+    op.create_table('book_embeddings',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('dim', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('vector', Vector(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('book_id', 'model')
+    )
+
+    # Copy existing embeddings, all of which were generated with text-embedding-004
+    op.execute(f"""
+        INSERT INTO book_embeddings (book_id, model, dim, content_hash, vector)
+        SELECT
+            id,
+            '{EMBEDDING_MODEL}',
+            {EMBEDDING_DIM},
+            encode(sha256(convert_to({BOOK_TEXT_SQL}, 'UTF8')), 'hex'),
+            embedding
+        FROM books
+        WHERE embedding IS NOT NULL
+    """)
+
+    # One partial index per model; the cast gives the index a fixed dimension
+    op.execute(f"""
+        CREATE INDEX IF NOT EXISTS book_embeddings_text_embedding_004_idx
+        ON book_embeddings
+        USING ivfflat ((vector::vector({EMBEDDING_DIM})) vector_cosine_ops)
+        WITH (lists = 100)
+        WHERE model = '{EMBEDDING_MODEL}'
+    """)
+
+    op.execute('DROP INDEX IF EXISTS books_embedding_idx')
+    op.drop_column('books', 'embedding')
+
+
+def downgrade() -> None:
+    op.add_column('books', sa.Column('embedding', Vector(EMBEDDING_DIM), nullable=True))
+
+    op.execute(f"""
+        UPDATE books
+        SET embedding = e.vector::vector({EMBEDDING_DIM})
+        FROM book_embeddings e
+        WHERE e.book_id = books.id
+            AND e.model = '{EMBEDDING_MODEL}'
+    """)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS books_embedding_idx
+        ON books
+        USING ivfflat (embedding vector_cosine_ops)
+        WITH (lists = 100)
+    """)
+
+    op.execute('DROP INDEX IF EXISTS book_embeddings_text_embedding_004_idx')
+    op.drop_table('book_embeddings')
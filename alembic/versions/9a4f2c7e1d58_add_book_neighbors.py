@@ -0,0 +1,36 @@
+"""Add precomputed book_neighbors for similar books
+
+Revision ID: 9a4f2c7e1d58
+Revises: 3c1e8a5d9b27
+Create Date: 2026-10-19 14:12:27.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f2c7e1d58'
+down_revision = '3c1e8a5d9b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled by `python -m app.services.similar_books` after upgrading; until
+    # then /books/{book_id}/similar computes each list on demand
+    op.create_table('book_neighbors',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('neighbor_id', sa.Integer(), nullable=False),
+    sa.Column('similarity', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['neighbor_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('book_id', 'model', 'neighbor_id')
+    )
+    op.create_index('ix_book_neighbors_neighbor_id_model', 'book_neighbors', ['neighbor_id', 'model'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_book_neighbors_neighbor_id_model', table_name='book_neighbors')
+    op.drop_table('book_neighbors')
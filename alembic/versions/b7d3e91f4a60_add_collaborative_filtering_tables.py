@@ -0,0 +1,44 @@
+"""Add co_borrowed_books and user_recommendations
+
+Revision ID: b7d3e91f4a60
+Revises: 9a4f2c7e1d58
+Create Date: 2026-10-19 15:26:03.417952
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e91f4a60'
+down_revision = '9a4f2c7e1d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled by `python -m app.services.recommendations`; until then users are scored on request
+    op.create_table('co_borrowed_books',
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('neighbor_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['neighbor_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('book_id', 'neighbor_id')
+    )
+    op.create_table('user_recommendations',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'book_id')
+    )
+    op.create_index('ix_user_recommendations_computed_at', 'user_recommendations', ['computed_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_recommendations_computed_at', table_name='user_recommendations')
+    op.drop_table('user_recommendations')
+    op.drop_table('co_borrowed_books')
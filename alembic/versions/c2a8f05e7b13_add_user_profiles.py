@@ -0,0 +1,35 @@
+"""Add user_profiles taste vectors
+
+Revision ID: c2a8f05e7b13
+Revises: b7d3e91f4a60
+Create Date: 2026-10-19 16:08:52.731046
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a8f05e7b13'
+down_revision = 'b7d3e91f4a60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Profiles start with each user's next borrow; borrow_records has no
+    # timestamps to decay past borrows by, so there is no backfill
+    op.create_table('user_profiles',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('vector', Vector(), nullable=False),
+    sa.Column('weight', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'model')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_profiles')
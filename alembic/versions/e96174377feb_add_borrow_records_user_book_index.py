@@ -0,0 +1,30 @@
+"""Add borrow_records (user_id, book_id) index
+
+Revision ID: e96174377feb
+Revises: 8087b497deb0
+Create Date: 2026-10-19 10:02:17.364810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e96174377feb'
+down_revision = '8087b497deb0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Every borrow, return and borrowed-status lookup filters on user_id and book_id
+    op.create_index(
+        'ix_borrow_records_user_id_book_id',
+        'borrow_records',
+        ['user_id', 'book_id'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_borrow_records_user_id_book_id', table_name='borrow_records')
@@ -0,0 +1,130 @@
+"""Scope inventory and borrow records by library, hash partitioned
+
+Revision ID: f95bdf4d6f0e
+Revises: e96174377feb
+Create Date: 2026-10-19 11:40:08.215734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f95bdf4d6f0e'
+down_revision = 'e96174377feb'
+branch_labels = None
+depends_on = None
+
+# Existing inventory and loans move to this library (Settings.DEFAULT_LIBRARY_ID)
+DEFAULT_LIBRARY_ID = 1
+DEFAULT_LIBRARY_NAME = 'Main Library'
+
+# models.LIBRARY_PARTITIONS
+PARTITIONS = 16
+
+TABLE_DEFINITIONS = {
+    'book_inventory': """
+        id integer NOT NULL DEFAULT nextval('book_inventory_id_seq'),
+        library_id integer NOT NULL REFERENCES libraries (id),
+        book_id integer NOT NULL REFERENCES books (id),
+        total_copies integer NOT NULL,
+        borrowed_copies integer NOT NULL,
+        CONSTRAINT book_inventory_library_pkey PRIMARY KEY (library_id, id),
+        CONSTRAINT uq_book_inventory_library_id_book_id UNIQUE (library_id, book_id)
+    """,
+    'borrow_records': """
+        id integer NOT NULL DEFAULT nextval('borrow_records_id_seq'),
+        library_id integer NOT NULL REFERENCES libraries (id),
+        user_id integer NOT NULL REFERENCES users (id),
+        book_id integer NOT NULL REFERENCES books (id),
+        borrow_count integer NOT NULL,
+        delete_entry boolean NOT NULL,
+        CONSTRAINT borrow_records_library_pkey PRIMARY KEY (library_id, id)
+    """,
+}
+
+COLUMNS = {
+    'book_inventory': 'id, book_id, total_copies, borrowed_copies',
+    'borrow_records': 'id, user_id, book_id, borrow_count, delete_entry',
+}
+
+
+def upgrade() -> None:
+    op.execute(f"""
+        INSERT INTO libraries (id, name) VALUES ({DEFAULT_LIBRARY_ID}, '{DEFAULT_LIBRARY_NAME}')
+        ON CONFLICT (id) DO NOTHING
+    """)
+    op.execute("SELECT setval(pg_get_serial_sequence('libraries', 'id'), (SELECT max(id) FROM libraries))")
+
+    # Partitioned tables cannot be converted in place: build each one next to
+    # the old table, keep the id sequence, copy the rows and drop the old table
+    for table, definition in TABLE_DEFINITIONS.items():
+        op.execute(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned')
+        op.execute(f'CREATE TABLE {table} ({definition}) PARTITION BY HASH (library_id)')
+        for remainder in range(PARTITIONS):
+            op.execute(
+                f'CREATE TABLE {table}_p{remainder} PARTITION OF {table} '
+                f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})'
+            )
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        op.execute(f"""
+            INSERT INTO {table} (library_id, {COLUMNS[table]})
+            SELECT {DEFAULT_LIBRARY_ID}, {COLUMNS[table]} FROM {table}_unpartitioned
+        """)
+        op.execute(f'DROP TABLE {table}_unpartitioned')
+
+    op.create_index(op.f('ix_book_inventory_id'), 'book_inventory', ['id'], unique=False)
+    op.create_index(op.f('ix_borrow_records_id'), 'borrow_records', ['id'], unique=False)
+    # Borrow and return within a library
+    op.create_index(
+        'ix_borrow_records_library_id_user_id_book_id',
+        'borrow_records',
+        ['library_id', 'user_id', 'book_id'],
+        unique=False
+    )
+    # A user's loans across all libraries (my-books, history)
+    op.create_index('ix_borrow_records_user_id_book_id', 'borrow_records', ['user_id', 'book_id'], unique=False)
+
+
+def downgrade() -> None:
+    for table in TABLE_DEFINITIONS:
+        op.execute(f'ALTER TABLE {table} RENAME TO {table}_partitioned')
+
+    op.create_table('book_inventory',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('book_inventory_id_seq')"), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('total_copies', sa.Integer(), nullable=False),
+    sa.Column('borrowed_copies', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('book_id')
+    )
+    op.create_table('borrow_records',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('borrow_records_id_seq')"), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('borrow_count', sa.Integer(), nullable=False),
+    sa.Column('delete_entry', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # A single global counter per book again: only the default library's inventory survives
+    for table in TABLE_DEFINITIONS:
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f"""
+        INSERT INTO book_inventory ({COLUMNS['book_inventory']})
+        SELECT {COLUMNS['book_inventory']} FROM book_inventory_partitioned
+        WHERE library_id = {DEFAULT_LIBRARY_ID}
+    """)
+    op.execute(f"""
+        INSERT INTO borrow_records ({COLUMNS['borrow_records']})
+        SELECT {COLUMNS['borrow_records']} FROM borrow_records_partitioned
+    """)
+    for table in TABLE_DEFINITIONS:
+        op.execute(f'DROP TABLE {table}_partitioned')
+
+    op.create_index(op.f('ix_book_inventory_id'), 'book_inventory', ['id'], unique=False)
+    op.create_index(op.f('ix_borrow_records_id'), 'borrow_records', ['id'], unique=False)
+    op.create_index('ix_borrow_records_user_id_book_id', 'borrow_records', ['user_id', 'book_id'], unique=False)
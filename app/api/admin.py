@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from app.models.models import User
+from app.dependencies.auth import require_super_admin
+from app.observability import slow_query_log, trace_store, profile_store, to_collapsed, to_speedscope
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/slow-queries")
+def list_slow_queries(
+    limit: int = Query(20, ge=1, le=1000),
+    current_user: User = Depends(require_super_admin)
+):
+    """
+    Most recent slow requests with their SQL statements, bind-parameter
+    shapes, timings and (when sampled) EXPLAIN (ANALYZE, BUFFERS) plan.
+    Requires super_admin role.
+    """
+    return slow_query_log.records(limit)
+
+
+@router.delete("/slow-queries", status_code=204)
+def clear_slow_queries(current_user: User = Depends(require_super_admin)):
+    """Empty the slow-query buffer. Requires super_admin role."""
+    slow_query_log.clear()
+
+
+@router.get("/traces")
+def list_traces(
+    limit: int = Query(50, ge=1, le=1000),
+    route: Optional[str] = Query(None, description="Only traces for this route template, e.g. /books/semantic-search/"),
+    current_user: User = Depends(require_super_admin)
+):
+    """
+    Most recent sampled request traces, without their spans.
+    Requires super_admin role.
+    """
+    return trace_store.summaries(limit, route)
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(trace_id: str, current_user: User = Depends(require_super_admin)):
+    """
+    One trace with its spans (request, auth, SQL statements, embedding calls).
+    Requires super_admin role.
+    """
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (not sampled or already evicted)")
+    return trace
+
+
+@router.get("/profiles")
+def list_profiles(current_user: User = Depends(require_super_admin)):
+    """
+    Recent request profiles (requests sent with X-Profile: 1), without stacks.
+    Requires super_admin role.
+    """
+    return profile_store.summaries()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    current_user: User = Depends(require_super_admin)
+):
+    """
+    One request profile, as collapsed stacks (flamegraph.pl) or speedscope JSON.
+    Requires super_admin role.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "speedscope":
+        return to_speedscope(profile)
+    return PlainTextResponse(to_collapsed(profile))
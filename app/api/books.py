@@ -1,15 +1,211 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, text
+from sqlalchemy import and_, or_, text, select
+from pgvector.sqlalchemy import Vector
 from typing import List, Optional
-from app.database import get_db
-from app.models.models import Book, BookInventory, User, BorrowRecord
+import base64
+import csv
+import io
+import json
+import logging
+import struct
+from app.config import settings
+from app.database import get_db, get_read_db, SessionLocal
+from app.models.models import Book, BookEmbedding, BookNeighbor, BookInventory, User, ActiveLoan
 from app.schemas.schemas import BookCreate, BookUpdate, BookResponse, BookWithInventory, BookWithSimilarity
 from app.dependencies.auth import require_librarian, get_current_user
 from app.services.embedding_service import embedding_service
+from app.services.similar_books import nearest_neighbors, refresh_book_neighbors
+from app.services.personalization import book_vectors, get_profile, rerank
+from app.responses import ListSerializer, LIST_RESPONSES
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/books", tags=["books"])
 
+# Rows fetched per server-side cursor round trip when exporting the catalog
+EXPORT_BATCH_SIZE = 1000
+
+# Columns written by /books/export, in output order
+EXPORT_COLUMNS = [
+    Book.id,
+    Book.title,
+    Book.author,
+    Book.publisher,
+    Book.summary,
+    Book.genre,
+    Book.year_of_publishing,
+    Book.in_circulation,
+    BookInventory.total_copies,
+    BookInventory.borrowed_copies,
+]
+
+book_list_serializer = ListSerializer(BookWithInventory)
+book_similarity_serializer = ListSerializer(BookWithSimilarity)
+
+# Book columns that can be selected with the fields= sparse-fieldset parameter.
+# id, title and author are required by the response schema and always included.
+REQUIRED_BOOK_FIELDS = ("id", "title", "author")
+OPTIONAL_BOOK_FIELDS = ("publisher", "summary", "genre", "year_of_publishing", "in_circulation")
+
+
+def _parse_fields(fields: Optional[str]) -> List[str]:
+    """Resolve a comma-separated fields= value to the book columns to load"""
+    if not fields:
+        return list(REQUIRED_BOOK_FIELDS + OPTIONAL_BOOK_FIELDS)
+
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(REQUIRED_BOOK_FIELDS) - set(OPTIONAL_BOOK_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+
+    return list(REQUIRED_BOOK_FIELDS) + [name for name in OPTIONAL_BOOK_FIELDS if name in requested]
+
+
+def _book_rows_query(db: Session, field_names: List[str], library_id: Optional[int] = None):
+    """Select only the requested book columns plus one library's inventory counts, in one query"""
+    library_id = library_id or settings.DEFAULT_LIBRARY_ID
+    return db.query(
+        *[getattr(Book, name) for name in field_names],
+        BookInventory.id.label("inventory_id"),
+        BookInventory.library_id,
+        BookInventory.total_copies,
+        BookInventory.borrowed_copies,
+    ).outerjoin(BookInventory, and_(BookInventory.book_id == Book.id, BookInventory.library_id == library_id))
+
+
+def _borrowed_book_ids(db: Session, user_id: int, book_ids: List[int], library_id: Optional[int] = None) -> set:
+    """Return the subset of book_ids the user currently has borrowed from the library"""
+    if not book_ids:
+        return set()
+
+    rows = db.query(ActiveLoan.book_id).filter(
+        ActiveLoan.library_id == (library_id or settings.DEFAULT_LIBRARY_ID),
+        ActiveLoan.user_id == user_id,
+        ActiveLoan.book_id.in_(book_ids)
+    ).all()
+    return {row.book_id for row in rows}
+
+
+def _book_dicts(db: Session, rows, field_names: List[str], user_id: int, library_id: Optional[int] = None) -> List[dict]:
+    """Build BookWithInventory payloads from projected rows"""
+    borrowed_ids = _borrowed_book_ids(db, user_id, [row.id for row in rows], library_id)
+
+    result = []
+    for row in rows:
+        book_data = {name: getattr(row, name) for name in field_names}
+        if row.inventory_id is not None:
+            book_data["inventory"] = {
+                "id": row.inventory_id,
+                "library_id": row.library_id,
+                "book_id": row.id,
+                "total_copies": row.total_copies,
+                "borrowed_copies": row.borrowed_copies,
+            }
+            book_data["available_copies"] = row.total_copies - row.borrowed_copies
+        else:
+            book_data["inventory"] = None
+            book_data["available_copies"] = None
+
+        # Check if current user has borrowed this book
+        book_data["is_borrowed_by_user"] = row.id in borrowed_ids
+
+        result.append(book_data)
+
+    return result
+
+
+def _refresh_embedding(db: Session, db_book: Book) -> bool:
+    """
+    Store an embedding of the book's current text for the active model.
+
+    Skips the Vertex AI call when the stored embedding was generated from the
+    same text (matching content_hash). Returns whether a new vector was stored.
+    """
+    book_text = embedding_service.book_text(
+        title=db_book.title,
+        author=db_book.author,
+        summary=db_book.summary,
+        genre=db_book.genre
+    )
+    content_hash = embedding_service.content_hash(book_text)
+
+    existing = None
+    if db_book.id is not None:
+        existing = db.get(BookEmbedding, (db_book.id, embedding_service.model_name))
+        if existing and existing.content_hash == content_hash:
+            return False
+
+    # Generate embedding for the book using title, author, summary, and genre
+    embedding = embedding_service.generate_embedding(
+        title=db_book.title,
+        author=db_book.author,
+        summary=db_book.summary,
+        genre=db_book.genre
+    )
+    if not embedding:
+        return False
+
+    if existing:
+        existing.vector = embedding
+        existing.dim = len(embedding)
+        existing.content_hash = content_hash
+    else:
+        db.add(BookEmbedding(
+            book=db_book,
+            model=embedding_service.model_name,
+            dim=len(embedding),
+            content_hash=content_hash,
+            vector=embedding
+        ))
+    return True
+
+
+def _refresh_neighbors(db: Session, book_id: int):
+    """Update the similar-books lists after a commit that stored a new embedding"""
+    try:
+        refresh_book_neighbors(db, book_id)
+    except Exception as e:
+        # The book itself is saved; its list is computed on demand until the next refresh
+        db.rollback()
+        logger.warning(f"Could not refresh similar books for book {book_id}: {e}")
+
+
+def _semantic_search_sql(members_only: bool, min_similarity: float = 0.4, include_vectors: bool = False):
+    """
+    Nearest-neighbour query over book_embeddings for the active model.
+
+    The vector expression matches the per-model partial index
+    (vector::vector(dim) with vector_cosine_ops) so the index can serve the ORDER BY.
+    Only returns results with similarity >= min_similarity (0.4 for the API) to ensure quality matches.
+    include_vectors also returns each match's stored embedding, for reranking.
+    """
+    vector_expr = f"e.vector::vector({embedding_service.dimension})"
+    query_expr = f"CAST(:query_embedding AS vector({embedding_service.dimension}))"
+    circulation_filter = "AND b.in_circulation = true" if members_only else ""
+    vector_column = ", e.vector" if include_vectors else ""
+
+    statement = text(f"""
+        SELECT
+            b.id,
+            1 - ({vector_expr} <=> {query_expr}) as similarity{vector_column}
+        FROM book_embeddings e
+        JOIN books b ON b.id = e.book_id
+        WHERE e.model = :model
+            {circulation_filter}
+            AND (1 - ({vector_expr} <=> {query_expr})) >= {float(min_similarity)}
+        ORDER BY {vector_expr} <=> {query_expr}
+        LIMIT :limit
+    """)
+    if include_vectors:
+        # Typed so the embeddings come back as arrays rather than their text form
+        statement = statement.columns(vector=Vector())
+    return statement
+
 
 @router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
 def create_book(
@@ -18,33 +214,28 @@ def create_book(
     current_user: User = Depends(require_librarian)
 ):
     db_book = Book(**book.model_dump())
-
-    # Generate embedding for the book using title, author, summary, and genre
-    embedding = embedding_service.generate_embedding(
-        title=book.title,
-        author=book.author,
-        summary=book.summary,
-        genre=book.genre
-    )
-
-    if embedding:
-        db_book.embedding = embedding
+    embedding_changed = _refresh_embedding(db, db_book)
 
     db.add(db_book)
     db.commit()
+    if embedding_changed:
+        _refresh_neighbors(db, db_book.id)
     db.refresh(db_book)
     return db_book
 
 
-@router.get("/", response_model=List[BookWithInventory])
+@router.get("/", response_model=List[BookWithInventory], responses=LIST_RESPONSES)
 def list_books(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     genre: str = None,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Comma-separated book fields to return (id, title and author are always included)"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Book)
+    field_names = _parse_fields(fields)
+    query = _book_rows_query(db, field_names)
 
     # Members should only see books that are in circulation
     if current_user.user_type.value == "member":
@@ -53,34 +244,21 @@ def list_books(
     if genre:
         query = query.filter(Book.genre == genre)
 
-    books = query.offset(skip).limit(limit).all()
-
-    result = []
-    for book in books:
-        book_data = BookWithInventory.model_validate(book)
-        if book.inventory:
-            book_data.available_copies = book.inventory.total_copies - book.inventory.borrowed_copies
-
-        # Check if current user has borrowed this book
-        borrow_record = db.query(BorrowRecord).filter(
-            BorrowRecord.user_id == current_user.id,
-            BorrowRecord.book_id == book.id,
-            BorrowRecord.delete_entry == False
-        ).first()
-        book_data.is_borrowed_by_user = borrow_record is not None
-
-        result.append(book_data)
+    rows = query.offset(skip).limit(limit).all()
 
-    return result
+    return book_list_serializer.response(_book_dicts(db, rows, field_names, current_user.id), request)
 
 
-@router.get("/search/", response_model=List[BookWithInventory])
+@router.get("/search/", response_model=List[BookWithInventory], responses=LIST_RESPONSES)
 def search_books(
+    request: Request,
     title: Optional[str] = Query(None, description="Search by book title (partial match)"),
     author: Optional[str] = Query(None, description="Search by author name (partial match)"),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Comma-separated book fields to return (id, title and author are always included)"),
+    personalize: bool = Query(False, description="Order the page by similarity to the books you have borrowed"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -92,6 +270,10 @@ def search_books(
     - If both provided with different values, returns books matching BOTH criteria (AND logic)
     - If only one provided, returns books matching that criterion
     - Returns empty list if no search terms provided
+    - **fields**: Optional sparse fieldset, e.g. `fields=genre,in_circulation` to drop summaries
+    - **personalize**: Order the first PERSONALIZATION_TEXT_CANDIDATES matches by similarity to
+      your borrowing profile before paging (text matches have no relevance score, so the profile
+      alone decides); pages past them continue in the unpersonalized order
     """
 
     if not title and not author:
@@ -100,7 +282,8 @@ def search_books(
             detail="At least one search parameter (title or author) is required"
         )
 
-    query = db.query(Book)
+    field_names = _parse_fields(fields)
+    query = _book_rows_query(db, field_names)
 
     # Members should only see books that are in circulation
     if current_user.user_type.value == "member":
@@ -125,33 +308,48 @@ def search_books(
         # Different search terms - use AND logic
         query = query.filter(*filters)
 
-    books = query.offset(skip).limit(limit).all()
+    profile = None
+    if personalize:
+        # Personalized pages rerank a window of matches in id order; pages
+        # past it must continue in that same order
+        query = query.order_by(Book.id)
+        profile = get_profile(db, current_user.id)
+
+    if profile is not None and skip < settings.PERSONALIZATION_TEXT_CANDIDATES:
+        rows = _personalized_page(db, query, profile, skip, limit)
+    else:
+        rows = query.offset(skip).limit(limit).all()
 
     # Build response with inventory info
-    result = []
-    for book in books:
-        book_data = BookWithInventory.model_validate(book)
-        if book.inventory:
-            book_data.available_copies = book.inventory.total_copies - book.inventory.borrowed_copies
+    return book_list_serializer.response(_book_dicts(db, rows, field_names, current_user.id), request)
 
-        # Check if current user has borrowed this book
-        borrow_record = db.query(BorrowRecord).filter(
-            BorrowRecord.user_id == current_user.id,
-            BorrowRecord.book_id == book.id,
-            BorrowRecord.delete_entry == False
-        ).first()
-        book_data.is_borrowed_by_user = borrow_record is not None
 
-        result.append(book_data)
+def _personalized_page(db: Session, query, profile, skip: int, limit: int) -> list:
+    """
+    One page of text matches after reranking the first PERSONALIZATION_TEXT_CANDIDATES
+    by profile similarity; a page running past them continues in query order.
+    Window and continuation come from one query, so the page costs a fixed
+    number of statements.
+    """
+    window = settings.PERSONALIZATION_TEXT_CANDIDATES
+    matches = query.limit(max(window, skip + limit)).all()
+    if not matches:
+        return []
 
-    return result
+    by_id = {row.id: row for row in matches[:window]}
+    order = rerank(profile, list(by_id), book_vectors(db, list(by_id)))
+    reranked = [by_id[book_id] for book_id in order] + matches[window:]
+    return reranked[skip:skip + limit]
 
 
-@router.get("/semantic-search/", response_model=List[BookWithSimilarity])
+@router.get("/semantic-search/", response_model=List[BookWithSimilarity], responses=LIST_RESPONSES)
 def semantic_search_books(
+    request: Request,
     query: str = Query(..., description="Natural language search query"),
     limit: int = Query(10, ge=1, le=50, description="Number of results to return"),
-    db: Session = Depends(get_db),
+    fields: Optional[str] = Query(None, description="Comma-separated book fields to return (id, title and author are always included)"),
+    personalize: bool = Query(False, description="Blend in similarity to the books you have borrowed"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -162,9 +360,14 @@ def semantic_search_books(
     - **query**: Natural language description of what you're looking for
       (e.g., "mysteries set in Victorian England", "books about space exploration")
     - **limit**: Maximum number of results to return (1-50)
+    - **fields**: Optional sparse fieldset of book fields to return
+    - **personalize**: Rerank the top PERSONALIZATION_CANDIDATES x limit matches by blending
+      query similarity with similarity to your borrowing profile (similarity_score stays the
+      query similarity)
 
     Returns books ranked by semantic similarity with similarity scores.
     """
+    field_names = _parse_fields(fields)
 
     # Generate embedding for the search query
     query_embedding = embedding_service.generate_query_embedding(query)
@@ -180,94 +383,214 @@ def semantic_search_books(
 
     # Query for similar books using cosine similarity
     # Note: Using 1 - cosine distance to get similarity score (higher = more similar)
-    # Using CAST instead of :: to avoid parameter binding issues
-    # Only return results with similarity >= 0.4 to ensure quality matches
     # Members should only see books that are in circulation
-    if current_user.user_type.value == "member":
-        query_sql = text("""
-            SELECT
-                b.*,
-                1 - (b.embedding <=> CAST(:query_embedding AS vector)) as similarity
-            FROM books b
-            WHERE b.embedding IS NOT NULL
-                AND b.in_circulation = true
-                AND (1 - (b.embedding <=> CAST(:query_embedding AS vector))) >= 0.4
-            ORDER BY b.embedding <=> CAST(:query_embedding AS vector)
-            LIMIT :limit
-        """)
-    else:
-        query_sql = text("""
-            SELECT
-                b.*,
-                1 - (b.embedding <=> CAST(:query_embedding AS vector)) as similarity
-            FROM books b
-            WHERE b.embedding IS NOT NULL
-                AND (1 - (b.embedding <=> CAST(:query_embedding AS vector))) >= 0.4
-            ORDER BY b.embedding <=> CAST(:query_embedding AS vector)
-            LIMIT :limit
-        """)
+    profile = get_profile(db, current_user.id) if personalize else None
+    query_sql = _semantic_search_sql(
+        members_only=current_user.user_type.value == "member",
+        include_vectors=profile is not None
+    )
+    candidates = limit * settings.PERSONALIZATION_CANDIDATES if profile is not None else limit
 
     result_rows = db.execute(
         query_sql,
-        {"query_embedding": embedding_str, "limit": limit}
+        {"query_embedding": embedding_str, "model": embedding_service.model_name, "limit": candidates}
     ).fetchall()
 
+    if not result_rows:
+        return book_similarity_serializer.response([], request)
+
+    # Fetch the matched books in one projected query (no embeddings) and keep similarity order
+    similarity_by_id = {row.id: float(row.similarity) for row in result_rows}
+    if profile is not None:
+        order = rerank(profile, list(similarity_by_id), {row.id: row.vector for row in result_rows}, similarity_by_id)
+        similarity_by_id = {book_id: similarity_by_id[book_id] for book_id in order[:limit]}
+    rows = _book_rows_query(db, field_names).filter(Book.id.in_(list(similarity_by_id))).all()
+    book_dicts = {
+        book_data["id"]: book_data
+        for book_data in _book_dicts(db, rows, field_names, current_user.id)
+    }
+
     # Build response with book data and similarity scores
     results = []
-    for row in result_rows:
-        # Get the book object
-        book = db.query(Book).filter(Book.id == row.id).first()
+    for book_id, similarity in similarity_by_id.items():
+        book_data = book_dicts.get(book_id)
+        if book_data:
+            book_data["similarity_score"] = similarity
+            results.append(book_data)
 
-        if book:
-            # First validate as BookWithInventory to get book data
-            book_dict = BookWithInventory.model_validate(book).model_dump()
+    return book_similarity_serializer.response(results, request)
 
-            # Add inventory information
-            if book.inventory:
-                book_dict['available_copies'] = book.inventory.total_copies - book.inventory.borrowed_copies
 
-            # Check if current user has borrowed this book
-            borrow_record = db.query(BorrowRecord).filter(
-                BorrowRecord.user_id == current_user.id,
-                BorrowRecord.book_id == book.id,
-                BorrowRecord.delete_entry == False
-            ).first()
-            book_dict['is_borrowed_by_user'] = borrow_record is not None
+def _encode_embedding(embedding) -> Optional[str]:
+    """Pack an embedding as base64 little-endian float32 (4 bytes per dimension)"""
+    if embedding is None:
+        return None
+    return base64.b64encode(struct.pack(f"<{len(embedding)}f", *embedding)).decode("ascii")
 
-            # Add similarity score
-            book_dict['similarity_score'] = float(row.similarity)
 
-            # Now create BookWithSimilarity with all required fields
-            book_data = BookWithSimilarity(**book_dict)
+def _iter_export_rows(statement):
+    """
+    Stream rows for an export statement through a server-side cursor.
 
-            results.append(book_data)
+    Uses its own session so the cursor stays open for as long as the
+    response body is being sent, independently of the request's session.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _ndjson_chunks(statement, include_embeddings: bool):
+    for partition in _iter_export_rows(statement):
+        lines = []
+        for row in partition:
+            record = dict(row._mapping)
+            if include_embeddings:
+                record["embedding"] = _encode_embedding(record["embedding"])
+            lines.append(json.dumps(record))
+        yield "\n".join(lines) + "\n"
+
+
+def _csv_chunks(statement, header: List[str], include_embeddings: bool):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+
+    for partition in _iter_export_rows(statement):
+        buffer.seek(0)
+        buffer.truncate(0)
+        for row in partition:
+            values = list(row)
+            if include_embeddings:
+                values[-1] = _encode_embedding(values[-1])
+            writer.writerow(values)
+        yield buffer.getvalue()
+
+
+@router.get("/export")
+def export_books(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="Output format: ndjson or csv"),
+    include_embeddings: bool = Query(False, description="Include embeddings as base64-encoded little-endian float32"),
+    current_user: User = Depends(require_librarian)
+):
+    """
+    Stream the whole catalog as NDJSON or CSV.
 
-    return results
+    Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE
+    and written out as they arrive, so memory use does not grow with the size
+    of the catalog. Only the exported columns are selected; embeddings are
+    skipped unless **include_embeddings** is set. Copy counts are those of
+    the default library.
+    """
+    columns = list(EXPORT_COLUMNS)
+    if include_embeddings:
+        columns.append(BookEmbedding.vector.label("embedding"))
+
+    statement = select(*columns).outerjoin(
+        BookInventory,
+        and_(BookInventory.book_id == Book.id, BookInventory.library_id == settings.DEFAULT_LIBRARY_ID)
+    )
+    if include_embeddings:
+        statement = statement.outerjoin(
+            BookEmbedding,
+            and_(BookEmbedding.book_id == Book.id, BookEmbedding.model == embedding_service.model_name)
+        )
+    statement = statement.order_by(Book.id)
+
+    if export_format == "csv":
+        header = [column.key for column in columns]
+        content = _csv_chunks(statement, header, include_embeddings)
+        media_type = "text/csv"
+    else:
+        content = _ndjson_chunks(statement, include_embeddings)
+        media_type = "application/x-ndjson"
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=catalog.{export_format}"}
+    )
 
 
 @router.get("/{book_id}", response_model=BookWithInventory)
 def get_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    book = db.query(Book).filter(Book.id == book_id).first()
-    if not book:
+    field_names = _parse_fields(None)
+    row = _book_rows_query(db, field_names).filter(Book.id == book_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    book_data = BookWithInventory.model_validate(book)
-    if book.inventory:
-        book_data.available_copies = book.inventory.total_copies - book.inventory.borrowed_copies
+    book_data = _book_dicts(db, [row], field_names, current_user.id)[0]
+    return BookWithInventory.model_validate(book_data)
+
+
+@router.get("/{book_id}/similar", response_model=List[BookWithSimilarity], responses=LIST_RESPONSES)
+def similar_books(
+    request: Request,
+    book_id: int,
+    limit: int = Query(10, ge=1, le=50, description="Number of similar books to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated book fields to return (id, title and author are always included)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Books most similar to this one, by its stored embedding (no Vertex AI call).
+
+    Served from the precomputed book_neighbors list in one indexed lookup;
+    books whose list has not been computed yet fall back to a vector search.
+    At most SIMILAR_BOOKS_K results come from the stored list.
+    """
+    field_names = _parse_fields(fields)
+    members_only = current_user.user_type.value == "member"
+
+    query = _book_rows_query(db, field_names).add_columns(BookNeighbor.similarity).join(
+        BookNeighbor,
+        and_(
+            BookNeighbor.neighbor_id == Book.id,
+            BookNeighbor.book_id == book_id,
+            BookNeighbor.model == embedding_service.model_name
+        )
+    )
+    if members_only:
+        query = query.filter(Book.in_circulation == True)
+    rows = query.order_by(BookNeighbor.similarity.desc()).limit(limit).all()
+
+    if rows:
+        similarity_by_id = {row.id: float(row.similarity) for row in rows}
+    else:
+        if not db.query(Book.id).filter(Book.id == book_id).first():
+            raise HTTPException(status_code=404, detail="Book not found")
+        # Over-fetch so members still get up to limit books after the circulation filter
+        neighbors = nearest_neighbors(db, book_id, limit * 2 if members_only else limit)
+        if not neighbors:
+            return book_similarity_serializer.response([], request)
+        similarity_by_id = {row.id: float(row.similarity) for row in neighbors}
+        query = _book_rows_query(db, field_names).filter(Book.id.in_(list(similarity_by_id)))
+        if members_only:
+            query = query.filter(Book.in_circulation == True)
+        rows = query.all()
+
+    book_dicts = {
+        book_data["id"]: book_data
+        for book_data in _book_dicts(db, rows, field_names, current_user.id)
+    }
 
-    # Check if current user has borrowed this book
-    borrow_record = db.query(BorrowRecord).filter(
-        BorrowRecord.user_id == current_user.id,
-        BorrowRecord.book_id == book.id,
-        BorrowRecord.delete_entry == False
-    ).first()
-    book_data.is_borrowed_by_user = borrow_record is not None
+    results = []
+    for neighbor_id, similarity in similarity_by_id.items():
+        book_data = book_dicts.get(neighbor_id)
+        if book_data:
+            book_data["similarity_score"] = similarity
+            results.append(book_data)
 
-    return book_data
+    return book_similarity_serializer.response(results[:limit], request)
 
 
 @router.put("/{book_id}", response_model=BookResponse)
@@ -286,18 +609,13 @@ def update_book(
         setattr(db_book, field, value)
 
     # Regenerate embedding if title, author, summary, or genre changed
+    embedding_changed = False
     if any(field in update_data for field in ['title', 'author', 'summary', 'genre']):
-        embedding = embedding_service.generate_embedding(
-            title=db_book.title,
-            author=db_book.author,
-            summary=db_book.summary,
-            genre=db_book.genre
-        )
-
-        if embedding:
-            db_book.embedding = embedding
+        embedding_changed = _refresh_embedding(db, db_book)
 
     db.commit()
+    if embedding_changed:
+        _refresh_neighbors(db, db_book.id)
     db.refresh(db_book)
     return db_book
 
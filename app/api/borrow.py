@@ -1,21 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.models.models import BorrowRecord, BookInventory, Book, User
-from app.schemas.schemas import BorrowRecordCreate, BorrowRecordResponse
+from sqlalchemy import update, delete, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from datetime import datetime
+from typing import List, Optional
+from app.config import settings
+from app.database import get_db, mark_recent_write
+from app.models.models import BorrowRecord, BookInventory, Book, User, ActiveLoan, BorrowEvent, BorrowEventKind
+from app.schemas.schemas import BorrowRecordCreate, BorrowRecordResponse, BorrowEventResponse
 from app.dependencies.auth import get_current_user
+from app.services.personalization import update_profile
 
 router = APIRouter(prefix="/borrow", tags=["borrow"])
 
 
-@router.post("/", response_model=BorrowRecordResponse, status_code=status.HTTP_201_CREATED)
-def borrow_book(
-    borrow: BorrowRecordCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    book = db.query(Book).filter(Book.id == borrow.book_id).first()
+def _checkout_copy_statement(library_id: int, book_id: int):
+    """Take one copy of the book; matches no row when none are available"""
+    return update(BookInventory).where(
+        BookInventory.library_id == library_id,
+        BookInventory.book_id == book_id,
+        BookInventory.borrowed_copies < BookInventory.total_copies
+    ).values(
+        borrowed_copies=BookInventory.borrowed_copies + 1
+    ).execution_options(synchronize_session=False)
+
+
+def _return_copy_statement(library_id: int, book_id: int):
+    """Put one copy of the book back; matches no row when none are borrowed"""
+    return update(BookInventory).where(
+        BookInventory.library_id == library_id,
+        BookInventory.book_id == book_id,
+        BookInventory.borrowed_copies > 0
+    ).values(
+        borrowed_copies=BookInventory.borrowed_copies - 1
+    ).execution_options(synchronize_session=False)
+
+
+def _inventory_exists(db: Session, library_id: int, book_id: int) -> bool:
+    return db.query(BookInventory.id).filter(
+        BookInventory.library_id == library_id,
+        BookInventory.book_id == book_id
+    ).first() is not None
+
+
+def _record_event(db: Session, kind: BorrowEventKind, library_id: int, user_id: int, book_id: int):
+    """Append to the borrow event log; committed with the borrow or return itself"""
+    db.execute(insert(BorrowEvent).values(library_id=library_id, user_id=user_id, book_id=book_id, kind=kind))
+
+
+def _borrow_copy(db: Session, current_user: User, library_id: int, book_id: int) -> BorrowRecord:
+    """Borrow one copy of the book from the library and commit"""
+    book = db.query(Book.in_circulation).filter(Book.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
@@ -26,107 +61,132 @@ def borrow_book(
             detail="This book is not available for circulation"
         )
 
-    inventory = db.query(BookInventory).filter(
-        BookInventory.book_id == borrow.book_id
-    ).first()
-
-    if not inventory:
-        raise HTTPException(
-            status_code=400,
-            detail="No inventory record exists for this book"
-        )
-
-    available_copies = inventory.total_copies - inventory.borrowed_copies
-    if available_copies <= 0:
+    # Take a copy in one guarded UPDATE so concurrent borrows can never
+    # push borrowed_copies past total_copies
+    if db.execute(_checkout_copy_statement(library_id, book_id)).rowcount == 0:
+        if not _inventory_exists(db, library_id, book_id):
+            raise HTTPException(
+                status_code=400,
+                detail="No inventory record exists for this book"
+            )
         raise HTTPException(
             status_code=400,
             detail="No copies available for borrowing"
         )
 
-    # Check if user already has this book borrowed
-    existing_active_record = db.query(BorrowRecord).filter(
-        BorrowRecord.user_id == current_user.id,
-        BorrowRecord.book_id == borrow.book_id,
-        BorrowRecord.delete_entry == False
+    # The active loan's primary key admits one open loan per user and book,
+    # so of two concurrent borrows the second inserts nothing
+    loan = db.execute(
+        pg_insert(ActiveLoan).values(
+            library_id=library_id,
+            user_id=current_user.id,
+            book_id=book_id
+        ).on_conflict_do_nothing().returning(ActiveLoan.book_id)
     ).first()
-
-    if existing_active_record:
+    if loan is None:
+        db.rollback()
         raise HTTPException(
             status_code=400,
             detail="You have already borrowed this book. Please return it before borrowing again."
         )
 
-    # Check if there's a previous borrow record (returned)
-    previous_record = db.query(BorrowRecord).filter(
+    # Active records sort first; with no active loan this is the previously
+    # returned one, if any
+    borrow_record = db.query(BorrowRecord).filter(
+        BorrowRecord.library_id == library_id,
         BorrowRecord.user_id == current_user.id,
-        BorrowRecord.book_id == borrow.book_id,
-        BorrowRecord.delete_entry == True
-    ).first()
+        BorrowRecord.book_id == book_id
+    ).order_by(BorrowRecord.delete_entry).first()
 
-    if previous_record:
+    if borrow_record:
         # Reactivate the record and increment borrow count
-        previous_record.delete_entry = False
-        previous_record.borrow_count += 1
-        db.commit()
-        db.refresh(previous_record)
-        borrow_record = previous_record
+        borrow_record.delete_entry = False
+        borrow_record.borrow_count += 1
     else:
         # Create new borrow record
         borrow_record = BorrowRecord(
+            library_id=library_id,
             user_id=current_user.id,
-            book_id=borrow.book_id,
+            book_id=book_id,
             borrow_count=1,
             delete_entry=False
         )
         db.add(borrow_record)
 
-    inventory.borrowed_copies += 1
+    _record_event(db, BorrowEventKind.BORROW, library_id, current_user.id, book_id)
+    update_profile(db, current_user.id, book_id)
     db.commit()
     db.refresh(borrow_record)
-
     return borrow_record
 
 
-@router.post("/return/{book_id}", response_model=BorrowRecordResponse)
-def return_book(
-    book_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
+def _return_copy(db: Session, current_user: User, library_id: int, book_id: int) -> BorrowRecord:
+    """Return the user's borrowed copy of the book to the library and commit"""
+    # Closing the active loan first means a concurrent second return finds nothing to close
+    closed = db.execute(delete(ActiveLoan).where(
+        ActiveLoan.library_id == library_id,
+        ActiveLoan.user_id == current_user.id,
+        ActiveLoan.book_id == book_id
+    )).rowcount
     borrow_record = db.query(BorrowRecord).filter(
+        BorrowRecord.library_id == library_id,
         BorrowRecord.user_id == current_user.id,
         BorrowRecord.book_id == book_id,
         BorrowRecord.delete_entry == False
     ).first()
 
-    if not borrow_record:
+    if not closed or not borrow_record:
+        db.rollback()
         raise HTTPException(
             status_code=404,
             detail="No active borrow record found for this book"
         )
 
-    inventory = db.query(BookInventory).filter(
-        BookInventory.book_id == book_id
-    ).first()
-
-    if not inventory:
-        raise HTTPException(
-            status_code=400,
-            detail="Inventory record not found for this book"
-        )
-
-    if inventory.borrowed_copies <= 0:
+    if db.execute(_return_copy_statement(library_id, book_id)).rowcount == 0:
+        if not _inventory_exists(db, library_id, book_id):
+            raise HTTPException(
+                status_code=400,
+                detail="Inventory record not found for this book"
+            )
         raise HTTPException(
             status_code=400,
             detail="Cannot return book: no copies are marked as borrowed"
         )
 
-    inventory.borrowed_copies -= 1
     borrow_record.delete_entry = True
 
+    _record_event(db, BorrowEventKind.RETURN, library_id, current_user.id, book_id)
     db.commit()
     db.refresh(borrow_record)
+    return borrow_record
+
+
+@router.post("/", response_model=BorrowRecordResponse, status_code=status.HTTP_201_CREATED)
+def borrow_book(
+    borrow: BorrowRecordCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Borrow from the default library; see /libraries/{library_id}/borrow for other branches"""
+    borrow_record = _borrow_copy(db, current_user, settings.DEFAULT_LIBRARY_ID, borrow.book_id)
+
+    # Catalog reads may go to a replica; keep this client on the primary until it has caught up
+    mark_recent_write(response)
+    return borrow_record
+
+
+@router.post("/return/{book_id}", response_model=BorrowRecordResponse)
+def return_book(
+    book_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    borrow_record = _return_copy(db, current_user, settings.DEFAULT_LIBRARY_ID, book_id)
 
+    # Catalog reads may go to a replica; keep this client on the primary until it has caught up
+    mark_recent_write(response)
     return borrow_record
 
 
@@ -151,3 +211,17 @@ def get_borrow_history(
         BorrowRecord.user_id == current_user.id
     ).all()
     return records
+
+
+@router.get("/events", response_model=List[BorrowEventResponse])
+def get_borrow_events(
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[datetime] = Query(None, description="Only events before this time, for paging back"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The user's borrows and returns, newest first"""
+    query = db.query(BorrowEvent).filter(BorrowEvent.user_id == current_user.id)
+    if before is not None:
+        query = query.filter(BorrowEvent.at < before)
+    return query.order_by(BorrowEvent.at.desc()).limit(limit).all()
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
+from sqlalchemy import Boolean, and_, Integer, case, column, exists, literal, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from typing import List
+from app.config import settings
 from app.database import get_db
 from app.models.models import BookInventory, Book, User
-from app.schemas.schemas import BookInventoryCreate, BookInventoryUpdate, BookInventoryResponse
+from app.schemas.schemas import (
+    BookInventoryCreate, BookInventoryUpdate, BookInventoryResponse,
+    BookInventoryBulkUpdate, BookInventoryBulkResult, BookInventoryRejection
+)
 from app.dependencies.auth import require_librarian
+from app.responses import ListSerializer, LIST_RESPONSES
 
 router = APIRouter(prefix="/inventory", tags=["inventory"])
 
+inventory_list_serializer = ListSerializer(BookInventoryResponse)
+
 
 @router.post("/", response_model=BookInventoryResponse, status_code=status.HTTP_201_CREATED)
 def create_inventory(
@@ -15,11 +24,12 @@ def create_inventory(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_librarian)
 ):
-    book = db.query(Book).filter(Book.id == inventory.book_id).first()
+    book = db.query(Book.id).filter(Book.id == inventory.book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
     existing_inventory = db.query(BookInventory).filter(
+        BookInventory.library_id == settings.DEFAULT_LIBRARY_ID,
         BookInventory.book_id == inventory.book_id
     ).first()
     if existing_inventory:
@@ -28,22 +38,166 @@ def create_inventory(
             detail="Inventory already exists for this book. Use PUT to update."
         )
 
-    db_inventory = BookInventory(**inventory.model_dump())
+    db_inventory = BookInventory(library_id=settings.DEFAULT_LIBRARY_ID, **inventory.model_dump())
     db.add(db_inventory)
     db.commit()
     db.refresh(db_inventory)
     return db_inventory
 
 
-@router.get("/", response_model=List[BookInventoryResponse])
+@router.post("/bulk", response_model=BookInventoryBulkResult)
+def bulk_adjust_inventory(
+    bulk_update: BookInventoryBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_librarian)
+):
+    """
+    Apply many inventory adjustments in one transaction.
+
+    Each adjustment either sets **total_copies** to an absolute value or
+    changes it by **delta**. Existing rows are updated with a single
+    `UPDATE ... FROM (VALUES ...)`; books without an inventory row get one
+    inserted (borrowed_copies = 0). The `borrowed_copies <= total_copies`
+    invariant is checked in SQL, and adjustments that would break it, or that
+    reference unknown books, are returned in **rejected** instead of applied.
+    Applies to the default library.
+    """
+    adjustments = bulk_update.adjustments
+    if not adjustments:
+        return BookInventoryBulkResult()
+
+    book_ids = [adjustment.book_id for adjustment in adjustments]
+    if len(set(book_ids)) != len(book_ids):
+        raise HTTPException(
+            status_code=400,
+            detail="Each book_id may only appear once per bulk update"
+        )
+
+    inventory_table = BookInventory.__table__
+    books_table = Book.__table__
+    library_id = settings.DEFAULT_LIBRARY_ID
+
+    adjustment_values = values(
+        column("book_id", Integer),
+        column("value", Integer),
+        column("is_delta", Boolean),
+        name="adjustments"
+    ).data([
+        (
+            adjustment.book_id,
+            adjustment.delta if adjustment.delta is not None else adjustment.total_copies,
+            adjustment.delta is not None
+        )
+        for adjustment in adjustments
+    ])
+
+    returned_columns = (
+        inventory_table.c.id,
+        inventory_table.c.library_id,
+        inventory_table.c.book_id,
+        inventory_table.c.total_copies,
+        inventory_table.c.borrowed_copies,
+    )
+
+    new_total = case(
+        (adjustment_values.c.is_delta, inventory_table.c.total_copies + adjustment_values.c.value),
+        else_=adjustment_values.c.value
+    )
+    update_stmt = (
+        update(inventory_table)
+        .where(inventory_table.c.library_id == library_id)
+        .where(inventory_table.c.book_id == adjustment_values.c.book_id)
+        .where(new_total >= inventory_table.c.borrowed_copies)
+        .values(total_copies=new_total)
+        .returning(*returned_columns)
+    )
+    updated = db.execute(update_stmt).mappings().all()
+
+    # Books with no inventory row yet start from zero, so delta and absolute agree
+    insert_stmt = (
+        pg_insert(inventory_table)
+        .from_select(
+            ["library_id", "book_id", "total_copies", "borrowed_copies"],
+            select(literal(library_id), adjustment_values.c.book_id, adjustment_values.c.value, literal(0))
+            .join(books_table, books_table.c.id == adjustment_values.c.book_id)
+            .where(adjustment_values.c.value >= 0)
+            .where(~exists().where(
+                inventory_table.c.library_id == library_id,
+                inventory_table.c.book_id == adjustment_values.c.book_id
+            ))
+        )
+        .on_conflict_do_nothing(index_elements=["library_id", "book_id"])
+        .returning(*returned_columns)
+    )
+    created = db.execute(insert_stmt).mappings().all()
+
+    # A concurrent insert can win between the UPDATE and the INSERT, which
+    # then skips the book on conflict; apply those through the UPDATE path,
+    # against the row that now exists
+    applied_ids = {row["book_id"] for row in updated} | {row["book_id"] for row in created}
+    pending_ids = [book_id for book_id in book_ids if book_id not in applied_ids]
+    if pending_ids:
+        retried = db.execute(
+            update_stmt.where(inventory_table.c.book_id.in_(pending_ids))
+        ).mappings().all()
+        updated += retried
+        applied_ids |= {row["book_id"] for row in retried}
+
+    db.commit()
+
+    rejected_ids = [book_id for book_id in book_ids if book_id not in applied_ids]
+
+    rejected = []
+    if rejected_ids:
+        existing = db.execute(
+            select(books_table.c.id, inventory_table.c.total_copies)
+            .outerjoin(inventory_table, and_(
+                inventory_table.c.library_id == library_id,
+                inventory_table.c.book_id == books_table.c.id
+            ))
+            .where(books_table.c.id.in_(rejected_ids))
+        ).all()
+        current_totals = {row.id: row.total_copies or 0 for row in existing}
+        adjustments_by_id = {adjustment.book_id: adjustment for adjustment in adjustments}
+
+        for book_id in rejected_ids:
+            adjustment = adjustments_by_id[book_id]
+            if adjustment.delta is not None:
+                requested_total = current_totals.get(book_id, 0) + adjustment.delta
+            else:
+                requested_total = adjustment.total_copies
+
+            if book_id not in current_totals:
+                reason = "Book not found"
+            elif requested_total < 0:
+                reason = "Total copies cannot be negative"
+            else:
+                reason = "Borrowed copies cannot exceed total copies"
+            rejected.append(BookInventoryRejection(book_id=book_id, reason=reason))
+
+    return BookInventoryBulkResult(
+        updated=[BookInventoryResponse(**row) for row in updated],
+        created=[BookInventoryResponse(**row) for row in created],
+        rejected=rejected
+    )
+
+
+@router.get("/", response_model=List[BookInventoryResponse], responses=LIST_RESPONSES)
 def list_inventory(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(require_librarian)
 ):
-    inventories = db.query(BookInventory).offset(skip).limit(limit).all()
-    return inventories
+    rows = db.query(
+        BookInventory.id,
+        BookInventory.library_id,
+        BookInventory.book_id,
+        BookInventory.total_copies,
+        BookInventory.borrowed_copies,
+    ).filter(BookInventory.library_id == settings.DEFAULT_LIBRARY_ID).offset(skip).limit(limit).all()
+    return inventory_list_serializer.response([row._asdict() for row in rows], request)
 
 
 @router.get("/{book_id}", response_model=BookInventoryResponse)
@@ -52,7 +206,10 @@ def get_inventory(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_librarian)
 ):
-    inventory = db.query(BookInventory).filter(BookInventory.book_id == book_id).first()
+    inventory = db.query(BookInventory).filter(
+        BookInventory.library_id == settings.DEFAULT_LIBRARY_ID,
+        BookInventory.book_id == book_id
+    ).first()
     if not inventory:
         raise HTTPException(status_code=404, detail="Inventory not found for this book")
     return inventory
@@ -65,7 +222,10 @@ def update_inventory(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_librarian)
 ):
-    db_inventory = db.query(BookInventory).filter(BookInventory.book_id == book_id).first()
+    db_inventory = db.query(BookInventory).filter(
+        BookInventory.library_id == settings.DEFAULT_LIBRARY_ID,
+        BookInventory.book_id == book_id
+    ).first()
     if not db_inventory:
         raise HTTPException(status_code=404, detail="Inventory not found for this book")
 
@@ -92,7 +252,10 @@ def delete_inventory(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_librarian)
 ):
-    db_inventory = db.query(BookInventory).filter(BookInventory.book_id == book_id).first()
+    db_inventory = db.query(BookInventory).filter(
+        BookInventory.library_id == settings.DEFAULT_LIBRARY_ID,
+        BookInventory.book_id == book_id
+    ).first()
     if not db_inventory:
         raise HTTPException(status_code=404, detail="Inventory not found for this book")
 
@@ -0,0 +1,140 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, Request
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db, get_read_db, mark_recent_write
+from app.models.models import Book, BookInventory, Library, User
+from app.schemas.schemas import (
+    LibraryCreate, LibraryResponse, BookWithInventory, BookInventoryUpdate, BookInventoryResponse,
+    BorrowRecordCreate, BorrowRecordResponse
+)
+from app.dependencies.auth import get_current_user, require_librarian, require_super_admin
+from app.api.books import _book_dicts, _book_rows_query, _parse_fields, book_list_serializer
+from app.api.borrow import _borrow_copy, _return_copy
+from app.responses import LIST_RESPONSES
+
+router = APIRouter(prefix="/libraries", tags=["libraries"])
+
+
+def _get_library(db: Session, library_id: int) -> Library:
+    library = db.query(Library).filter(Library.id == library_id).first()
+    if not library:
+        raise HTTPException(status_code=404, detail="Library not found")
+    return library
+
+
+@router.get("/", response_model=List[LibraryResponse])
+def list_libraries(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    return db.query(Library).order_by(Library.id).all()
+
+
+@router.post("/", response_model=LibraryResponse, status_code=status.HTTP_201_CREATED)
+def create_library(
+    library: LibraryCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_super_admin)
+):
+    db_library = Library(**library.model_dump())
+    db.add(db_library)
+    db.commit()
+    db.refresh(db_library)
+    return db_library
+
+
+@router.get("/{library_id}/books", response_model=List[BookWithInventory], responses=LIST_RESPONSES)
+def list_library_books(
+    request: Request,
+    library_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    genre: str = None,
+    fields: Optional[str] = Query(None, description="Comma-separated book fields to return (id, title and author are always included)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Books held by one library, with that library's copy counts.
+
+    Only books with an inventory row in the library are listed; the lookups
+    stay within the library's partition of book_inventory and borrow_records.
+    """
+    _get_library(db, library_id)
+    field_names = _parse_fields(fields)
+    query = _book_rows_query(db, field_names, library_id).filter(BookInventory.library_id == library_id)
+
+    # Members should only see books that are in circulation
+    if current_user.user_type.value == "member":
+        query = query.filter(Book.in_circulation == True)
+
+    if genre:
+        query = query.filter(Book.genre == genre)
+
+    rows = query.offset(skip).limit(limit).all()
+
+    return book_list_serializer.response(_book_dicts(db, rows, field_names, current_user.id, library_id), request)
+
+
+@router.put("/{library_id}/inventory/{book_id}", response_model=BookInventoryResponse)
+def set_library_inventory(
+    library_id: int,
+    book_id: int,
+    inventory_update: BookInventoryUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_librarian)
+):
+    """Set a library's copy counts for a book, creating its inventory row if needed"""
+    _get_library(db, library_id)
+    if not db.query(Book.id).filter(Book.id == book_id).first():
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    db_inventory = db.query(BookInventory).filter(
+        BookInventory.library_id == library_id,
+        BookInventory.book_id == book_id
+    ).first()
+    if not db_inventory:
+        db_inventory = BookInventory(library_id=library_id, book_id=book_id, total_copies=0, borrowed_copies=0)
+        db.add(db_inventory)
+
+    update_data = inventory_update.model_dump(exclude_unset=True)
+    total_copies = update_data.get("total_copies", db_inventory.total_copies)
+    borrowed_copies = update_data.get("borrowed_copies", db_inventory.borrowed_copies)
+    if borrowed_copies > total_copies:
+        raise HTTPException(
+            status_code=400,
+            detail="Borrowed copies cannot exceed total copies"
+        )
+
+    for field, value in update_data.items():
+        setattr(db_inventory, field, value)
+
+    db.commit()
+    db.refresh(db_inventory)
+    return db_inventory
+
+
+@router.post("/{library_id}/borrow", response_model=BorrowRecordResponse, status_code=status.HTTP_201_CREATED)
+def borrow_from_library(
+    library_id: int,
+    borrow: BorrowRecordCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    borrow_record = _borrow_copy(db, current_user, library_id, borrow.book_id)
+    mark_recent_write(response)
+    return borrow_record
+
+
+@router.post("/{library_id}/return/{book_id}", response_model=BorrowRecordResponse)
+def return_to_library(
+    library_id: int,
+    book_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    borrow_record = _return_copy(db, current_user, library_id, book_id)
+    mark_recent_write(response)
+    return borrow_record
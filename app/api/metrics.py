@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from app.config import get_settings
+from app.observability.metrics import registry
+
+settings = get_settings()
+
+router = APIRouter(tags=["monitoring"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics(request: Request):
+    """Prometheus text exposition of request, database, embedding and cache metrics"""
+    if settings.METRICS_TOKEN:
+        if request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.orm import Session
+from sqlalchemy import and_
+from typing import List, Optional
+from app.database import get_read_db
+from app.models.models import Book, User, UserRecommendation
+from app.schemas.schemas import BookRecommendation
+from app.dependencies.auth import get_current_user
+from app.api.books import _book_dicts, _book_rows_query, _parse_fields
+from app.services.recommendations import recommend_for_user
+from app.responses import ListSerializer, LIST_RESPONSES
+
+router = APIRouter(prefix="/recommendations", tags=["recommendations"])
+
+book_recommendation_serializer = ListSerializer(BookRecommendation)
+
+
+@router.get("/me", response_model=List[BookRecommendation], responses=LIST_RESPONSES)
+def my_recommendations(
+    request: Request,
+    limit: int = Query(10, ge=1, le=50, description="Number of recommendations to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated book fields to return (id, title and author are always included)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Books borrowed by members with similar borrowing histories, best first.
+
+    Served from the user's precomputed list in one indexed lookup. Users
+    without a list yet (new borrowers between refreshes) are scored on
+    request from the co-borrowed book lists; with no borrows the list is empty.
+    """
+    field_names = _parse_fields(fields)
+    members_only = current_user.user_type.value == "member"
+
+    query = _book_rows_query(db, field_names).add_columns(UserRecommendation.score).join(
+        UserRecommendation,
+        and_(UserRecommendation.book_id == Book.id, UserRecommendation.user_id == current_user.id)
+    )
+    if members_only:
+        query = query.filter(Book.in_circulation == True)
+    rows = query.order_by(UserRecommendation.score.desc()).limit(limit).all()
+
+    if rows:
+        score_by_id = {row.id: float(row.score) for row in rows}
+    else:
+        # Over-fetch so members still get up to limit books after the circulation filter
+        scored = recommend_for_user(db, current_user.id, limit * 2 if members_only else limit)
+        if not scored:
+            return book_recommendation_serializer.response([], request)
+        score_by_id = {book_id: float(score) for book_id, score in scored}
+        query = _book_rows_query(db, field_names).filter(Book.id.in_(list(score_by_id)))
+        if members_only:
+            query = query.filter(Book.in_circulation == True)
+        rows = query.all()
+
+    book_dicts = {
+        book_data["id"]: book_data
+        for book_data in _book_dicts(db, rows, field_names, current_user.id)
+    }
+
+    results = []
+    for book_id, score in score_by_id.items():
+        book_data = book_dicts.get(book_id)
+        if book_data:
+            book_data["score"] = score
+            results.append(book_data)
+
+    return book_recommendation_serializer.response(results[:limit], request)
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.database import get_db
+from app.database import get_read_db
 from app.models.models import Book, User, BookInventory
 from app.dependencies.auth import get_current_user, require_librarian
 
@@ -10,7 +10,7 @@ router = APIRouter(prefix="/stats", tags=["statistics"])
 
 @router.get("/librarian")
 async def get_librarian_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(require_librarian)
 ):
     """
@@ -15,11 +15,97 @@ class Settings(BaseSettings):
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
 
+    # Run Base.metadata.create_all() at startup. Off by default: migrations
+    # (alembic upgrade head) own the schema, and the check costs a DB round
+    # trip before the server can accept connections.
+    VERIFY_SCHEMA_ON_STARTUP: bool = False
+
+    # Database connection pool
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+
+    # Read replicas (comma-separated URLs) for catalog and stats reads; empty sends everything to DATABASE_URL.
+    # Replicas are health-checked every REPLICA_HEALTH_CHECK_INTERVAL_S and skipped when down or lagging more
+    # than REPLICA_MAX_LAG_S. After a borrow or return, that client reads from the primary for
+    # READ_YOUR_WRITES_S so it sees its own change.
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_HEALTH_CHECK_INTERVAL_S: float = 5
+    REPLICA_MAX_LAG_S: float = 10
+    READ_YOUR_WRITES_S: float = 15
+
+    # Library whose inventory the unscoped /books, /inventory and /borrow endpoints use;
+    # other branches are reached through /libraries/{library_id}/...
+    DEFAULT_LIBRARY_ID: int = 1
+
+    # borrow_events monthly partitions: create this many months ahead, and detach those older than
+    # BORROW_EVENTS_RETENTION_MONTHS (0 keeps everything) into BORROW_EVENTS_ARCHIVE_SCHEMA (empty drops
+    # them). The maintenance job runs every BORROW_EVENTS_MAINTENANCE_INTERVAL_S (0 disables; use cron instead).
+    BORROW_EVENTS_PREMAKE_MONTHS: int = 3
+    BORROW_EVENTS_RETENTION_MONTHS: int = 24
+    BORROW_EVENTS_ARCHIVE_SCHEMA: str = "archive"
+    BORROW_EVENTS_MAINTENANCE_INTERVAL_S: float = 21600
+
+    # Collaborative filtering recommendations (python -m app.services.recommendations rebuilds them):
+    # top RECOMMENDATIONS_K stored per user, RECOMMENDATIONS_NEIGHBORS_K co-borrowed books kept per book,
+    # matrix rows processed per block, and how often recent borrowers are rescored (0 disables). Each refresh
+    # rescans RECOMMENDATIONS_REFRESH_OVERLAP_S before its last watermark for borrows committed late.
+    RECOMMENDATIONS_K: int = 20
+    RECOMMENDATIONS_NEIGHBORS_K: int = 30
+    RECOMMENDATIONS_BLOCK_SIZE: int = 2000
+    RECOMMENDATIONS_REFRESH_INTERVAL_S: float = 60
+    RECOMMENDATIONS_REFRESH_OVERLAP_S: float = 300
+
+    # Startup warm-up, reported through /api/ready
+    WARMUP_POOL_CONNECTIONS: int = 2  # connections to open before reporting ready (capped at DB_POOL_SIZE)
+    WARMUP_EMBEDDING_MODEL: bool = True  # initialize Vertex AI in the background
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" for structured lines, "text" for human-readable
+    # Request logs for these route templates are sampled at LOG_SAMPLE_RATE (errors are always logged)
+    LOG_SAMPLED_ROUTES: str = "/api/health,/api/ready,/api"
+    LOG_SAMPLE_RATE: float = 0.01
+
+    # Metrics: if set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN: str = ""
+
+    # Flag a request when one statement shape runs this many times (likely an N+1 loop)
+    N_PLUS_ONE_THRESHOLD: int = 5
+
+    # Slow-request capture (0 disables); a sampled fraction also gets EXPLAIN (ANALYZE, BUFFERS)
+    SLOW_REQUEST_THRESHOLD_MS: float = 500
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = 0.1
+    SLOW_QUERY_EXPLAIN_TIMEOUT_MS: int = 5000
+    SLOW_QUERY_BUFFER_SIZE: int = 100
+
+    # Tracing: fraction of requests that record spans, kept in memory and optionally in a rotating JSONL file
+    TRACE_SAMPLE_RATE: float = 0.05
+    TRACE_BUFFER_SIZE: int = 200
+    TRACE_FILE: str = ""
+    TRACE_FILE_MAX_BYTES: int = 10 * 1024 * 1024
+    TRACE_FILE_BACKUPS: int = 3
+
+    # On-demand profiler (super admins send X-Profile: 1); interval 0 disables it
+    PROFILE_INTERVAL_MS: float = 5
+    PROFILE_MAX_SECONDS: float = 30
+    PROFILE_BUFFER_SIZE: int = 20
+
     # Google Cloud / Vertex AI settings
     GOOGLE_CLOUD_PROJECT: str = ""
     GOOGLE_CLOUD_LOCATION: str = "us-central1"
     GOOGLE_APPLICATION_CREDENTIALS: str = ""
     GOOGLE_APPLICATION_CREDENTIALS_BASE64: str = ""
+    EMBEDDING_QUERY_CACHE_SIZE: int = 256  # recent search queries whose embeddings are kept in memory
+    SIMILAR_BOOKS_K: int = 20  # precomputed neighbours kept per book for /books/{book_id}/similar
+    EMBEDDING_BACKEND: str = "vertex"  # "stub" returns deterministic local vectors (load tests, no GCP)
+
+    # personalize=true on search: weight of profile similarity in the blend, semantic search candidates
+    # fetched per requested result, text search matches reranked before paging, and the half-life of a
+    # borrow's influence on the profile
+    PERSONALIZATION_WEIGHT: float = 0.3
+    PERSONALIZATION_CANDIDATES: int = 4
+    PERSONALIZATION_TEXT_CANDIDATES: int = 400
+    PERSONALIZATION_HALF_LIFE_DAYS: float = 180
 
     class Config:
         # Support multiple environment files
@@ -1,15 +1,136 @@
-from sqlalchemy import create_engine
+import itertools
+import logging
+import threading
+import time
+from fastapi import Request, Response
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import get_settings
+from app.observability.db import InstrumentedQueuePool
+from app.observability.metrics import DB_READ_SESSIONS
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(
+    settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Set after a borrow or return: unix time until which this client reads from the primary
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+
+# Seconds of replay lag; 0 when caught up with what was received, NULL on a primary
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaSet:
+    """
+    Round robin over read replicas that passed their last health check.
+
+    Replicas start out unhealthy, so reads go to the primary until the first
+    check has run. A replica is skipped while it is unreachable or its replay
+    lag exceeds REPLICA_MAX_LAG_S.
+    """
+
+    def __init__(self, urls):
+        self.engines = [
+            create_engine(
+                url,
+                poolclass=InstrumentedQueuePool,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_pre_ping=True
+            )
+            for url in urls
+        ]
+        self._sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+            for replica_engine in self.engines
+        ]
+        self._healthy = [False] * len(self.engines)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def next_sessionmaker(self):
+        """The next healthy replica's sessionmaker, or None if none is healthy"""
+        with self._lock:
+            for _ in range(len(self.engines)):
+                index = next(self._counter) % len(self.engines)
+                if self._healthy[index]:
+                    return self._sessionmakers[index]
+        return None
+
+    def check(self):
+        for index, replica_engine in enumerate(self.engines):
+            try:
+                with replica_engine.connect() as connection:
+                    lag = connection.execute(REPLICA_LAG_SQL).scalar()
+                healthy = lag is None or float(lag) <= settings.REPLICA_MAX_LAG_S
+                problem = None if healthy else f"replay lag {float(lag):.1f}s"
+            except Exception as e:
+                healthy = False
+                problem = str(e).splitlines()[0]
+
+            with self._lock:
+                changed = self._healthy[index] != healthy
+                self._healthy[index] = healthy
+            if changed:
+                url = replica_engine.url.render_as_string(hide_password=True)
+                if healthy:
+                    logger.info(f"Read replica {url} is healthy")
+                else:
+                    logger.warning(f"Read replica {url} taken out of rotation: {problem}")
+
+    def run_health_checks(self):
+        while True:
+            self.check()
+            time.sleep(settings.REPLICA_HEALTH_CHECK_INTERVAL_S)
+
+
+replicas = ReplicaSet([url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()])
+
+
+def start_replica_health_checks():
+    if replicas:
+        threading.Thread(target=replicas.run_health_checks, name="replica-health", daemon=True).start()
+
+
+def mark_recent_write(response: Response):
+    """Pin this client's reads to the primary for READ_YOUR_WRITES_S"""
+    if replicas:
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE,
+            str(int(time.time() + settings.READ_YOUR_WRITES_S)),
+            max_age=int(settings.READ_YOUR_WRITES_S),
+            httponly=True,
+            samesite="lax"
+        )
+
+
+def _reads_pinned_to_primary(request: Request) -> bool:
+    try:
+        until = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0))
+    except ValueError:
+        return False
+    now = time.time()
+    # Bounded so a hand-edited cookie cannot pin a client to the primary for good
+    return now < until <= now + settings.READ_YOUR_WRITES_S
+
 
 def get_db():
     db = SessionLocal()
@@ -17,3 +138,17 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: a healthy replica, else the primary"""
+    session_factory = None
+    if replicas and not _reads_pinned_to_primary(request):
+        session_factory = replicas.next_sessionmaker()
+    DB_READ_SESSIONS.inc("replica" if session_factory else "primary")
+
+    db = (session_factory or SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
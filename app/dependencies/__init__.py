@@ -1,3 +1,3 @@
-from app.dependencies.auth import get_current_user, require_librarian
+from app.dependencies.auth import get_current_user, require_librarian, require_super_admin
 
-__all__ = ["get_current_user", "require_librarian"]
+__all__ = ["get_current_user", "require_librarian", "require_super_admin"]
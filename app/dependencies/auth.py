@@ -6,6 +6,8 @@ from app.database import get_db
 from app.models.models import User, UserType
 from app.schemas.schemas import TokenData
 from app.config import get_settings
+from app.observability.context import current_request
+from app.observability.tracing import span
 from typing import Optional
 
 settings = get_settings()
@@ -47,18 +49,26 @@ def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    with span("auth.get_current_user", "auth"):
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+            token_data = TokenData(email=email)
+        except JWTError:
             raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
 
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if user is None:
-        raise credentials_exception
+        user = db.query(User).filter(User.email == token_data.email).first()
+        if user is None:
+            raise credentials_exception
+
+    request_context = current_request.get()
+    if request_context is not None:
+        request_context.user_type = user.user_type.value
+        # X-Profile: 1 is honoured for super admins only
+        if request_context.profiler is not None and user.user_type == UserType.SUPER_ADMIN:
+            request_context.profiler.start()
     return user
 
 
@@ -69,3 +79,12 @@ def require_librarian(current_user: User = Depends(get_current_user)) -> User:
             detail="Not enough permissions. Librarian access required."
         )
     return current_user
+
+
+def require_super_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.user_type != UserType.SUPER_ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions. Super admin access required."
+        )
+    return current_user
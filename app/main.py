@@ -1,21 +1,23 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from pathlib import Path
 import os
 import logging
-from app.api import auth, books, inventory, borrow, stats, users
-from app.database import engine
+from app.api import auth, books, inventory, borrow, libraries, recommendations, stats, users, metrics, admin
+from app.database import engine, start_replica_health_checks
 from app.models import models
 from app.config import get_settings
+from app.services.warmup import start_warmup, warmup_state
+from app.services.borrow_events import start_partition_maintenance
+from app.services.recommendations import start_recommendation_refresh
+from app.observability import setup_logging, ObservabilityMiddleware
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging (records are queued and written by a background listener)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 logger.info("=" * 60)
@@ -33,9 +35,6 @@ logger.info(f"Database URL: {settings.DATABASE_URL[:30]}...")
 logger.info(f"Google Client ID: {settings.GOOGLE_CLIENT_ID[:20]}...")
 logger.info(f"Port from env: {os.getenv('PORT', '8000')}")
 
-models.Base.metadata.create_all(bind=engine)
-logger.info("Database tables created/verified")
-
 app = FastAPI(
     title="Library Management System",
     description="A comprehensive library management system with Google SSO authentication",
@@ -67,12 +66,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost middleware: times the whole request and writes the access log
+app.add_middleware(ObservabilityMiddleware)
+
 app.include_router(auth.router)
 app.include_router(books.router)
 app.include_router(inventory.router)
 app.include_router(borrow.router)
+app.include_router(libraries.router)
+app.include_router(recommendations.router)
 app.include_router(stats.router)
 app.include_router(users.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
 
 logger.info("All routers registered")
 
@@ -80,10 +86,20 @@ logger.info("All routers registered")
 @app.on_event("startup")
 async def startup_event():
     """Log when the application starts"""
+    if settings.VERIFY_SCHEMA_ON_STARTUP:
+        await run_in_threadpool(models.Base.metadata.create_all, bind=engine)
+        logger.info("Database tables created/verified")
+
+    start_warmup()
+    start_replica_health_checks()
+    start_partition_maintenance()
+    start_recommendation_refresh()
+
     logger.info("=" * 60)
     logger.info("✅ APPLICATION STARTUP COMPLETE")
     logger.info(f"✅ Server is ready to accept connections")
     logger.info(f"✅ Health check endpoint: /api/health")
+    logger.info(f"✅ Readiness endpoint: /api/ready (warm-up running in background)")
     logger.info(f"✅ API docs endpoint: /docs")
     logger.info("=" * 60)
 
@@ -97,7 +113,6 @@ async def shutdown_event():
 @app.get("/api")
 def read_root():
     """API root endpoint"""
-    logger.info("API root endpoint called")
     return {
         "message": "Welcome to Library Management System API",
         "docs": "/docs",
@@ -108,10 +123,17 @@ def read_root():
 @app.get("/api/health")
 def health_check():
     """Health check endpoint"""
-    logger.info("Health check endpoint called - returning healthy status")
     return {"status": "healthy"}
 
 
+@app.get("/api/ready")
+def readiness_check():
+    """Readiness endpoint: 503 until the startup warm-up has finished"""
+    snapshot = warmup_state.snapshot()
+    status_code = 200 if snapshot["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=snapshot)
+
+
 @app.get("/debug/oauth-config")
 def debug_oauth_config():
     """Debug endpoint to check OAuth configuration (development only)"""
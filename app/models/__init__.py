@@ -1,3 +1,10 @@
-from app.models.models import Library, User, Book, BookInventory, BorrowRecord, UserType
+from app.models.models import (
+    Library, User, Book, BookEmbedding, UserProfile, BookNeighbor, CoBorrowedBook, UserRecommendation,
+    BookInventory, BorrowRecord, ActiveLoan, BorrowEvent, BorrowEventKind, UserType
+)
 
-__all__ = ["Library", "User", "Book", "BookInventory", "BorrowRecord", "UserType"]
+__all__ = [
+    "Library", "User", "Book", "BookEmbedding", "UserProfile", "BookNeighbor", "CoBorrowedBook",
+    "UserRecommendation", "BookInventory", "BorrowRecord", "ActiveLoan", "BorrowEvent", "BorrowEventKind",
+    "UserType"
+]
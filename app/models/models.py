@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Text, Enum as SQLEnum
+from sqlalchemy import (
+    Column, Integer, BigInteger, Float, String, ForeignKey, Boolean, Text, DateTime, Index, PrimaryKeyConstraint,
+    UniqueConstraint, DDL, event, func, Enum as SQLEnum
+)
 from sqlalchemy.orm import relationship
 from pgvector.sqlalchemy import Vector
 from app.database import Base
 import enum
 
+# book_inventory and borrow_records are HASH partitioned by library_id into this many partitions
+LIBRARY_PARTITIONS = 16
+
 
 class UserType(enum.Enum):
     SUPER_ADMIN = "super_admin"
@@ -11,6 +17,11 @@ class UserType(enum.Enum):
     MEMBER = "member"
 
 
+class BorrowEventKind(enum.Enum):
+    BORROW = "borrow"
+    RETURN = "return"
+
+
 class Library(Base):
     __tablename__ = "libraries"
 
@@ -18,6 +29,8 @@ class Library(Base):
     name = Column(String(255), nullable=False)
     address = Column(Text, nullable=True)
 
+    inventories = relationship("BookInventory", back_populates="library")
+
 
 class User(Base):
     __tablename__ = "users"
@@ -42,27 +55,141 @@ class Book(Base):
     genre = Column(String(100), nullable=True, index=True)
     year_of_publishing = Column(Integer, nullable=True)
     in_circulation = Column(Boolean, default=True, nullable=False)
-    embedding = Column(Vector(768), nullable=True)  # Vertex AI text-embedding-004 dimension
 
-    inventory = relationship("BookInventory", back_populates="book", uselist=False)
+    inventories = relationship("BookInventory", back_populates="book")
     borrow_records = relationship("BorrowRecord", back_populates="book")
+    embeddings = relationship(
+        "BookEmbedding",
+        back_populates="book",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+
+
+class BookEmbedding(Base):
+    """
+    Embedding of a book's text for one embedding model.
+
+    Kept out of the books table so that scans of books stay narrow. The vector
+    column has no fixed dimension so several models can coexist during a model
+    migration; each model gets its own partial index on vector::vector(dim).
+    """
+    __tablename__ = "book_embeddings"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String(100), primary_key=True)
+    dim = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False)  # SHA-256 of the embedded text
+    vector = Column(Vector(), nullable=False)
+
+    book = relationship("Book", back_populates="embeddings")
+
+
+class UserProfile(Base):
+    """
+    A user's taste vector for one embedding model: the time-decayed sum of
+    the embeddings of books they borrowed, and the matching decayed count.
+
+    vector / weight is the decayed mean; cosine similarity is the same for
+    either, so reranking uses the sum directly. Updated on each borrow by
+    app/services/personalization.py.
+    """
+    __tablename__ = "user_profiles"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String(100), primary_key=True)
+    vector = Column(Vector(), nullable=False)
+    weight = Column(Float, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class BookNeighbor(Base):
+    """
+    Precomputed nearest neighbours of a book's embedding for one model.
+
+    Holds up to SIMILAR_BOOKS_K rows per book, maintained by
+    app/services/similar_books.py, so /books/{book_id}/similar is a primary
+    key range scan instead of a vector search.
+    """
+    __tablename__ = "book_neighbors"
+    __table_args__ = (
+        # Lists that contain a book, to fix up when its embedding changes
+        Index("ix_book_neighbors_neighbor_id_model", "neighbor_id", "model"),
+    )
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    model = Column(String(100), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    similarity = Column(Float, nullable=False)
+
+
+class CoBorrowedBook(Base):
+    """
+    Item-item collaborative filtering neighbours: books borrowed by the same
+    members, scored by cosine similarity of their borrower vectors.
+
+    Rebuilt by app/services/recommendations.py; the per-user recommendations
+    are scored from these lists.
+    """
+    __tablename__ = "co_borrowed_books"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+
+
+class UserRecommendation(Base):
+    """Precomputed top recommendations per user, served by /recommendations/me"""
+    __tablename__ = "user_recommendations"
+    __table_args__ = (
+        # max(computed_at) tells a restarted refresh job where to resume
+        Index("ix_user_recommendations_computed_at", "computed_at"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 
 class BookInventory(Base):
+    """
+    Copies of a book held by one library.
+
+    Partitioned by library_id so that branches update their own counters in
+    separate partitions; the primary key and unique constraint include the
+    partition key, as Postgres requires.
+    """
     __tablename__ = "book_inventory"
+    __table_args__ = (
+        PrimaryKeyConstraint("library_id", "id", name="book_inventory_library_pkey"),
+        UniqueConstraint("library_id", "book_id", name="uq_book_inventory_library_id_book_id"),
+        {"postgresql_partition_by": "HASH (library_id)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    book_id = Column(Integer, ForeignKey("books.id"), unique=True, nullable=False)
+    id = Column(Integer, autoincrement=True, index=True)
+    library_id = Column(Integer, ForeignKey("libraries.id"), nullable=False)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
     total_copies = Column(Integer, default=0, nullable=False)
     borrowed_copies = Column(Integer, default=0, nullable=False)
 
-    book = relationship("Book", back_populates="inventory")
+    library = relationship("Library", back_populates="inventories")
+    book = relationship("Book", back_populates="inventories")
 
 
 class BorrowRecord(Base):
     __tablename__ = "borrow_records"
+    __table_args__ = (
+        PrimaryKeyConstraint("library_id", "id", name="borrow_records_library_pkey"),
+        # Borrow and return within a library
+        Index("ix_borrow_records_library_id_user_id_book_id", "library_id", "user_id", "book_id"),
+        # A user's loans across all libraries (my-books, history)
+        Index("ix_borrow_records_user_id_book_id", "user_id", "book_id"),
+        {"postgresql_partition_by": "HASH (library_id)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, autoincrement=True, index=True)
+    library_id = Column(Integer, ForeignKey("libraries.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
     borrow_count = Column(Integer, default=1, nullable=False)
@@ -70,3 +197,63 @@ class BorrowRecord(Base):
 
     user = relationship("User", back_populates="borrow_records")
     book = relationship("Book", back_populates="borrow_records")
+
+
+class ActiveLoan(Base):
+    """
+    Books currently out: one row per (library, user, book) from borrow to return.
+
+    The hot working set for current state. The primary key also rejects a
+    second concurrent borrow of the same book by the same user.
+    """
+    __tablename__ = "active_loans"
+    __table_args__ = (
+        Index("ix_active_loans_book_id", "book_id"),
+    )
+
+    library_id = Column(Integer, ForeignKey("libraries.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id"), primary_key=True)
+    borrowed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class BorrowEvent(Base):
+    """
+    Append-only log of borrows and returns, written in the same transaction.
+
+    Range partitioned by month on `at`; app/services/borrow_events.py creates
+    upcoming partitions and detaches expired ones. No foreign keys, so
+    history outlives deleted books and users and partitions detach cheaply.
+    """
+    __tablename__ = "borrow_events"
+    __table_args__ = (
+        PrimaryKeyConstraint("at", "id", name="borrow_events_pkey"),
+        Index("ix_borrow_events_user_id_at", "user_id", "at"),
+        Index("ix_borrow_events_book_id_at", "book_id", "at"),
+        {"postgresql_partition_by": "RANGE (at)"},
+    )
+
+    id = Column(BigInteger, autoincrement=True)
+    at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    library_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    book_id = Column(Integer, nullable=False)
+    kind = Column(SQLEnum(BorrowEventKind), nullable=False)
+
+
+def _create_library_partitions(table):
+    """Create the hash partitions with the table (Base.metadata.create_all); migrations do the same"""
+    for remainder in range(LIBRARY_PARTITIONS):
+        event.listen(table, "after_create", DDL(
+            f"CREATE TABLE {table.name}_p{remainder} PARTITION OF {table.name} "
+            f"FOR VALUES WITH (MODULUS {LIBRARY_PARTITIONS}, REMAINDER {remainder})"
+        ).execute_if(dialect="postgresql"))
+
+
+_create_library_partitions(BookInventory.__table__)
+_create_library_partitions(BorrowRecord.__table__)
+
+# Monthly partitions are added by the maintenance job; the default one catches anything outside them
+event.listen(BorrowEvent.__table__, "after_create", DDL(
+    "CREATE TABLE borrow_events_default PARTITION OF borrow_events DEFAULT"
+).execute_if(dialect="postgresql"))
@@ -0,0 +1,16 @@
+from app.observability.structured_logging import setup_logging, JsonFormatter
+from app.observability.middleware import ObservabilityMiddleware
+from app.observability.context import RequestContext, current_request
+from app.observability.metrics import registry
+from app.observability.queries import assert_query_budget, statement_shape, ROUTE_QUERY_BUDGETS
+from app.observability.slow_queries import slow_query_log
+from app.observability.tracing import span, trace_store
+from app.observability.profiling import profile_store, to_collapsed, to_speedscope
+
+__all__ = [
+    "setup_logging", "JsonFormatter", "ObservabilityMiddleware",
+    "RequestContext", "current_request", "registry",
+    "assert_query_budget", "statement_shape", "ROUTE_QUERY_BUDGETS",
+    "slow_query_log", "span", "trace_store",
+    "profile_store", "to_collapsed", "to_speedscope"
+]
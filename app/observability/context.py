@@ -0,0 +1,36 @@
+"""
+Per-request instrumentation state
+"""
+
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+# Statements kept per request for slow-request capture; counters keep going past it
+MAX_RECORDED_STATEMENTS = 200
+
+
+class RequestContext:
+    """
+    Mutable per-request counters.
+
+    ObservabilityMiddleware sets one per request in a ContextVar. Threadpool
+    workers (sync endpoints and dependencies) run in a copy of the request's
+    context, so they see and update the same object.
+    """
+
+    __slots__ = ("method", "path", "db_queries", "db_seconds", "statement_counts", "statements", "trace_id", "trace", "user_type", "profiler")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.statement_counts: Dict[str, int] = {}  # statement shape -> executions
+        self.statements: List[Tuple[str, Any, float, Any]] = []  # (statement, parameters, seconds, engine)
+        self.trace_id: Optional[str] = None
+        self.trace = None  # tracing.Trace when the request is sampled for tracing
+        self.user_type: Optional[str] = None  # set by get_current_user
+        self.profiler = None  # profiling.StackSampler when X-Profile: 1 was sent; started by get_current_user
+
+
+current_request: ContextVar[Optional[RequestContext]] = ContextVar("current_request", default=None)
@@ -0,0 +1,63 @@
+"""
+SQLAlchemy instrumentation: statement timing and pool wait time
+"""
+
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from app.observability.context import MAX_RECORDED_STATEMENTS, current_request
+from app.observability.metrics import DB_POOL_WAIT, DB_QUERY_DURATION
+from app.observability.queries import statement_shape
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    end = time.perf_counter()
+    start = start_times.pop()
+    elapsed = end - start
+
+    DB_QUERY_DURATION.observe(elapsed)
+
+    request_context = current_request.get()
+    if request_context is not None:
+        request_context.db_queries += 1
+        request_context.db_seconds += elapsed
+        shape = statement_shape(statement)
+        request_context.statement_counts[shape] = request_context.statement_counts.get(shape, 0) + 1
+        if len(request_context.statements) < MAX_RECORDED_STATEMENTS:
+            request_context.statements.append((statement, parameters, elapsed, conn.engine))
+        if request_context.trace is not None:
+            request_context.trace.add_span(
+                "db.query", "db", start, end,
+                {"statement": shape[:500], "rows": cursor.rowcount, "executemany": executemany}
+            )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # The statement failed, so after_cursor_execute will not pop its start time
+    connection = exception_context.connection
+    if connection is not None:
+        start_times = connection.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
@@ -0,0 +1,188 @@
+"""
+Prometheus-compatible metrics with lock-light collection
+
+Each metric keeps one shard of values per thread. Recording only touches the
+calling thread's shard, so request threads never contend on a shared lock;
+a lock is taken once per thread (when its shard is created) and when
+/metrics merges the shards for exposition.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _snapshot(self) -> List[Dict]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict.copy() is atomic under the GIL, so concurrent writers are safe
+        return [shard.copy() for shard in shards]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        totals: Dict[Tuple, float] = {}
+        for shard in self._snapshot():
+            for labelvalues, value in shard.items():
+                totals[labelvalues] = totals.get(labelvalues, 0.0) + value
+
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}"
+            for labelvalues, value in sorted(totals.items())
+        ]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: str):
+        shard = self._shard()
+        values = shard.get(labelvalues)
+        if values is None:
+            # Per-bucket (non-cumulative) counts, then sum and count
+            values = [0] * (len(self.buckets) + 2)
+            shard[labelvalues] = values
+
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                values[index] += 1
+                break
+        values[-2] += value
+        values[-1] += 1
+
+    def render(self) -> List[str]:
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in self._snapshot():
+            for labelvalues, values in shard.items():
+                values = list(values)
+                merged = totals.setdefault(labelvalues, [0] * len(values))
+                for index, value in enumerate(values):
+                    merged[index] += value
+
+        lines = []
+        for labelvalues, values in sorted(totals.items()):
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, values):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, labelvalues, ("le", _format_value(upper_bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {values[-1]}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Text exposition format 0.0.4"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status")
+))
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+))
+HTTP_REQUEST_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request", ("route",), buckets=QUERY_COUNT_BUCKETS
+))
+HTTP_REQUEST_DB_SECONDS = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request", ("route",)
+))
+REPEATED_STATEMENTS = registry.register(Counter(
+    "http_request_repeated_statements_total", "Statement shapes repeated N_PLUS_ONE_THRESHOLD+ times in one request", ("route",)
+))
+QUERY_BUDGET_EXCEEDED = registry.register(Counter(
+    "http_request_query_budget_exceeded_total", "Requests that executed more SQL statements than their route's budget", ("route",)
+))
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "Duration of individual SQL statements"
+))
+DB_POOL_WAIT = registry.register(Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+))
+DB_READ_SESSIONS = registry.register(Counter(
+    "db_read_sessions_total", "Read-only request sessions by target (replica, or primary when sticky or no replica is healthy)", ("target",)
+))
+EMBEDDING_DURATION = registry.register(Histogram(
+    "embedding_request_duration_seconds", "Vertex AI embedding call latency", ("operation",)
+))
+EMBEDDING_ERRORS = registry.register(Counter(
+    "embedding_errors_total", "Failed or unavailable embedding calls", ("operation",)
+))
+CACHE_REQUESTS = registry.register(Counter(
+    "cache_requests_total", "Cache lookups by cache name and result (hit or miss)", ("cache", "result")
+))
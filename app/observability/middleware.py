@@ -0,0 +1,132 @@
+"""
+Per-request instrumentation middleware
+"""
+
+import logging
+import random
+import sys
+import time
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from app.config import settings
+from app.observability.context import RequestContext, current_request
+from app.observability.metrics import (
+    HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_DB_SECONDS
+)
+from app.observability.queries import check_request_queries
+from app.observability.slow_queries import capture_if_slow
+from app.observability.tracing import Trace, new_trace_id, trace_store
+from app.observability.profiling import StackSampler, profile_store, profiling_requested
+
+access_logger = logging.getLogger("app.access")
+
+SAMPLED_ROUTES = frozenset(
+    route.strip() for route in settings.LOG_SAMPLED_ROUTES.split(",") if route.strip()
+)
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route (e.g. /books/{book_id}), to keep label cardinality low"""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    return "unmatched"
+
+
+def _should_log(route: str, status_code: int) -> bool:
+    if status_code >= 400 or route not in SAMPLED_ROUTES:
+        return True
+    return random.random() < settings.LOG_SAMPLE_RATE
+
+
+class ObservabilityMiddleware:
+    """
+    Pure ASGI middleware that times every HTTP request, records request and
+    per-request DB metrics, and writes a structured access log line (route
+    template, status, latency).
+
+    Requests to LOG_SAMPLED_ROUTES are logged at LOG_SAMPLE_RATE unless they
+    fail. Repeated statement shapes and exceeded query budgets are flagged,
+    and in DEBUG mode the SQL count and time are returned as X-DB-Query-Count
+    and X-DB-Query-Time-Ms headers. Requests slower than
+    SLOW_REQUEST_THRESHOLD_MS are kept in the slow-query log. Every response
+    carries an X-Trace-Id; TRACE_SAMPLE_RATE of requests record spans. Super
+    admins can send X-Profile: 1 to have the request sampled by the stack
+    profiler.
+
+    Written as plain ASGI rather than BaseHTTPMiddleware so it adds no extra
+    task or body buffering per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        request_context = RequestContext(scope["method"], scope["path"])
+        request_context.trace_id = new_trace_id()
+        if random.random() < settings.TRACE_SAMPLE_RATE:
+            request_context.trace = Trace(request_context.trace_id)
+        token = current_request.set(request_context)
+
+        profiler = None
+        if profiling_requested(scope):
+            profiler = StackSampler(scope, sys._getframe())
+            request_context.profiler = profiler
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Trace-Id", request_context.trace_id)
+                if profiler is not None and profiler.started:
+                    headers.append("X-Profile-Id", profiler.profile_id)
+                if settings.DEBUG:
+                    headers.append("X-DB-Query-Count", str(request_context.db_queries))
+                    headers.append("X-DB-Query-Time-Ms", f"{request_context.db_seconds * 1000:.2f}")
+            await send(message)
+
+        try:
+            if request_context.trace is not None:
+                with request_context.trace.open_span("http.request", "server", {"method": scope["method"], "path": scope["path"]}):
+                    await self.app(scope, receive, send_wrapper)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            if profiler is not None and profiler.started:
+                await run_in_threadpool(profiler.stop)
+            duration = time.perf_counter() - start
+            duration_ms = duration * 1000
+            route = route_template(scope)
+
+            HTTP_REQUESTS.inc(scope["method"], route, str(status_code))
+            HTTP_REQUEST_DURATION.observe(duration, scope["method"], route)
+            HTTP_REQUEST_DB_QUERIES.observe(request_context.db_queries, route)
+            HTTP_REQUEST_DB_SECONDS.observe(request_context.db_seconds, route)
+            check_request_queries(scope["method"], route, request_context)
+            capture_if_slow(scope["method"], route, duration, request_context)
+            if request_context.trace is not None:
+                trace_store.add(request_context.trace.to_dict(scope["method"], route, status_code))
+            if profiler is not None and profiler.started:
+                profile_store.add(profiler.report(scope["method"], route))
+
+            if _should_log(route, status_code):
+                access_logger.info(
+                    "request",
+                    extra={"fields": {
+                        "method": scope["method"],
+                        "route": route,
+                        "status": status_code,
+                        "duration_ms": round(duration_ms, 2),
+                        "db_queries": request_context.db_queries,
+                        "db_ms": round(request_context.db_seconds * 1000, 2),
+                        "trace_id": request_context.trace_id,
+                    }}
+                )
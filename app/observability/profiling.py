@@ -0,0 +1,203 @@
+"""
+On-demand sampling profiler for single requests
+
+A super admin sends `X-Profile: 1` with any request. The middleware prepares
+a sampler and get_current_user starts it once the user is confirmed to be a
+super admin, so the profile covers the request from authentication on and
+no thread is started for anyone else. While it runs, a sampler thread reads
+sys._current_frames() every PROFILE_INTERVAL_MS and keeps the stacks that
+belong to the request: stacks passing through the middleware's own
+coroutine frame (async code) or through the matched endpoint's __code__
+(sync endpoints in the threadpool). Ticks where neither is on a stack are
+counted as waiting (await, threadpool hand-off, sync dependencies).
+Concurrent requests to the same sync endpoint can be attributed to each
+other.
+
+The profile is stored under the id returned in X-Profile-Id and served as
+collapsed stacks or speedscope JSON by /admin/profiles/{profile_id}.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from starlette.requests import Request
+from app.config import settings
+
+WAITING_FRAME = "(waiting: await, threadpool or dependencies)"
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def profiling_requested(scope) -> bool:
+    """X-Profile: 1 was sent; the sampler only starts if get_current_user finds a super admin"""
+    if settings.PROFILE_INTERVAL_MS <= 0:
+        return False
+    return Request(scope).headers.get("x-profile") == "1"
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of one in-flight request from a background thread"""
+
+    def __init__(self, scope, anchor_frame):
+        self.profile_id = uuid.uuid4().hex
+        self.interval = settings.PROFILE_INTERVAL_MS / 1000
+        self._scope = scope
+        self._anchor = anchor_frame
+        self._counts: Dict[Tuple[str, ...], int] = {}
+        self._ticks = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._started_at = datetime.now(timezone.utc)
+        self._start = 0.0
+        self._duration = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._thread.ident is not None
+
+    def start(self):
+        if self.started:
+            return
+        self._start = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        """Blocks until the current sample is done; call it from a worker thread, not the event loop"""
+        self._stop.set()
+        self._thread.join()
+        self._duration = time.perf_counter() - self._start
+
+    def _run(self):
+        deadline = time.monotonic() + settings.PROFILE_MAX_SECONDS
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self._sample(own_thread)
+
+    def _sample(self, own_thread: int):
+        endpoint_code = getattr(self._scope.get("endpoint"), "__code__", None)
+        self._ticks += 1
+        matched = False
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+
+            stack = []
+            belongs = False
+            while frame is not None:
+                if frame is self._anchor:
+                    # Drop the event loop frames below the middleware
+                    belongs = True
+                    stack.append(_frame_label(frame.f_code))
+                    break
+                if frame.f_code is endpoint_code:
+                    belongs = True
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+
+            if belongs:
+                matched = True
+                key = tuple(reversed(stack))
+                self._counts[key] = self._counts.get(key, 0) + 1
+
+        if not matched:
+            key = (WAITING_FRAME,)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def report(self, method: str, route: str) -> Dict:
+        return {
+            "profile_id": self.profile_id,
+            "started_at": self._started_at.isoformat(),
+            "method": method,
+            "route": route,
+            "duration_ms": round(self._duration * 1000, 2),
+            "interval_ms": settings.PROFILE_INTERVAL_MS,
+            "samples": self._ticks,
+            "stacks": self._counts,
+        }
+
+
+def to_collapsed(profile: Dict) -> str:
+    """Brendan Gregg's collapsed format: root;...;leaf count (for flamegraph.pl, speedscope, etc.)"""
+    lines = [
+        ";".join(stack) + f" {count}"
+        for stack, count in sorted(profile["stacks"].items(), key=lambda item: -item[1])
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(profile: Dict) -> Dict:
+    """Sampled profile in speedscope's file format, weighted in milliseconds"""
+    frame_index: Dict[str, int] = {}
+    frames: List[Dict] = []
+    samples: List[List[int]] = []
+    weights: List[float] = []
+
+    for stack, count in profile["stacks"].items():
+        indices = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label})
+            indices.append(frame_index[label])
+        samples.append(indices)
+        weights.append(count * profile["interval_ms"])
+
+    name = f"{profile['method']} {profile['route']} ({profile['profile_id']})"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "library-management-profiler",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+class ProfileStore:
+    """Ring buffer of finished request profiles"""
+
+    def __init__(self, maxlen: int):
+        self._profiles = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, profile: Dict):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile["profile_id"] == profile_id:
+                    return profile
+        return None
+
+    def summaries(self) -> List[Dict]:
+        """Most recent first, without stacks"""
+        with self._lock:
+            profiles = list(reversed(self._profiles))
+        return [{key: value for key, value in profile.items() if key != "stacks"} for profile in profiles]
+
+
+profile_store = ProfileStore(settings.PROFILE_BUFFER_SIZE)
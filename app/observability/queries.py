@@ -0,0 +1,95 @@
+"""
+Per-request SQL query budgets and N+1 detection
+"""
+
+import logging
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Tuple
+from app.config import settings
+from app.observability.context import RequestContext, current_request
+from app.observability.metrics import QUERY_BUDGET_EXCEEDED, REPEATED_STATEMENTS
+
+logger = logging.getLogger(__name__)
+
+# Maximum SQL statements per request, by (method, route template). Each list
+# endpoint is one user lookup, one page query and one borrowed-status query,
+# regardless of page size.
+ROUTE_QUERY_BUDGETS: Dict[Tuple[str, str], int] = {
+    ("GET", "/books/"): 3,
+    # personalize=true adds the profile lookup and the candidates' embeddings; a text search page
+    # crossing the rerank window still loads window and continuation in one query
+    ("GET", "/books/search/"): 5,
+    ("GET", "/books/semantic-search/"): 5,
+    ("GET", "/books/{book_id}"): 3,
+    # Precomputed list: neighbours joined to books in one query; the on-demand fallback adds two
+    ("GET", "/books/{book_id}/similar"): 5,
+    ("GET", "/inventory/"): 2,
+    ("GET", "/borrow/my-books"): 2,
+    ("GET", "/borrow/history"): 2,
+    ("GET", "/borrow/events"): 2,
+    ("GET", "/libraries/{library_id}/books"): 4,
+    # Stored list joined to books in one query; scoring a user without one adds two
+    ("GET", "/recommendations/me"): 5,
+    ("GET", "/stats/librarian"): 4,
+}
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so executions differing only in IN-list length compare equal"""
+    return _WHITESPACE.sub(" ", _IN_LIST.sub("IN (...)", statement)).strip()
+
+
+def check_request_queries(method: str, route: str, request_context: RequestContext):
+    """Flag repeated statement shapes (likely N+1 loops) and exceeded query budgets"""
+    for shape, count in request_context.statement_counts.items():
+        if count >= settings.N_PLUS_ONE_THRESHOLD:
+            REPEATED_STATEMENTS.inc(route)
+            logger.warning(
+                "repeated SQL statement in one request (possible N+1)",
+                extra={"fields": {"route": route, "count": count, "statement": shape[:500]}}
+            )
+
+    budget = ROUTE_QUERY_BUDGETS.get((method, route))
+    if budget is not None and request_context.db_queries > budget:
+        QUERY_BUDGET_EXCEEDED.inc(route)
+        logger.warning(
+            "SQL query budget exceeded",
+            extra={"fields": {"route": route, "queries": request_context.db_queries, "budget": budget}}
+        )
+
+
+@contextmanager
+def assert_query_budget(max_queries: int):
+    """
+    Fail with AssertionError if the block executes more than max_queries SQL statements.
+
+    Counts through a RequestContext set in the current_request ContextVar,
+    as ObservabilityMiddleware does for a request, so statements from
+    background threads (warm-up, health checks, maintenance jobs) are not
+    counted. Call endpoint functions directly inside the block, passing every
+    Query parameter (omitted ones keep their truthy Query(...) defaults);
+    yields the RequestContext:
+
+        with assert_query_budget(ROUTE_QUERY_BUDGETS[("GET", "/books/")]):
+            list_books(request, skip=0, limit=100, genre=None, fields=None, db=db, current_user=user)
+    """
+    request_context = RequestContext("TEST", "assert_query_budget")
+    token = current_request.set(request_context)
+    try:
+        yield request_context
+    finally:
+        current_request.reset(token)
+
+    if request_context.db_queries > max_queries:
+        raise AssertionError(
+            f"{request_context.db_queries} SQL statements executed, budget is {max_queries}:\n"
+            + "\n".join(
+                f"  {count}x {shape[:200]}" for shape, count in request_context.statement_counts.items()
+            )
+        )
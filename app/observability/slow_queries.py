@@ -0,0 +1,144 @@
+"""
+Slow-request capture with sampled EXPLAIN (ANALYZE, BUFFERS) plans
+
+Requests slower than SLOW_REQUEST_THRESHOLD_MS are recorded with their SQL
+statements, bind-parameter shapes (types and sizes, never values) and
+timings in a bounded ring buffer. For SLOW_QUERY_EXPLAIN_SAMPLE_RATE of them
+the slowest SELECT is re-run under EXPLAIN (ANALYZE, BUFFERS) on a
+background thread, against the engine (primary or replica) that ran it and
+inside a transaction that is always rolled back. Locking reads (FOR UPDATE,
+FOR SHARE) are never re-run, since ANALYZE would take their row locks.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.observability.context import RequestContext
+
+logger = logging.getLogger(__name__)
+
+MAX_EXPLAINS_IN_FLIGHT = 2
+
+_LOCKING_CLAUSE = re.compile(r"\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b", re.IGNORECASE)
+
+
+def parameter_shape(parameters) -> Any:
+    """Describe bind parameters by type (and length for large values) without exposing values"""
+    if isinstance(parameters, dict):
+        return {name: _value_shape(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [parameter_shape(item) if isinstance(item, (dict, list, tuple)) else _value_shape(item) for item in parameters]
+    return _value_shape(parameters)
+
+
+def _value_shape(value) -> str:
+    type_name = type(value).__name__
+    if isinstance(value, (str, bytes, list, tuple)) and len(value) > 16:
+        return f"{type_name}[{len(value)}]"
+    return type_name
+
+
+class SlowQueryLog:
+    """Thread-safe ring buffer of slow requests"""
+
+    def __init__(self, maxlen: int):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+        self._explains_in_flight = 0
+
+    def capture(self, method: str, route: str, duration: float, request_context: RequestContext):
+        statements = [
+            {
+                "statement": statement,
+                "parameters": parameter_shape(parameters),
+                "duration_ms": round(elapsed * 1000, 2),
+            }
+            for statement, parameters, elapsed, _ in request_context.statements
+        ]
+        record = {
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "method": method,
+            "route": route,
+            "duration_ms": round(duration * 1000, 2),
+            "db_queries": request_context.db_queries,
+            "db_ms": round(request_context.db_seconds * 1000, 2),
+            "statements": statements,
+            "explain": None,
+        }
+        with self._lock:
+            self._records.append(record)
+
+        logger.warning(
+            "slow request",
+            extra={"fields": {"route": route, "duration_ms": record["duration_ms"], "db_queries": record["db_queries"]}}
+        )
+
+        if random.random() < settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            self._schedule_explain(record, request_context.statements)
+
+    def _schedule_explain(self, record: Dict, statements: List):
+        selects = [
+            entry for entry in statements
+            if entry[0].lstrip().upper().startswith("SELECT") and not _LOCKING_CLAUSE.search(entry[0])
+        ]
+        if not selects:
+            return
+
+        with self._lock:
+            if self._explains_in_flight >= MAX_EXPLAINS_IN_FLIGHT:
+                return
+            self._explains_in_flight += 1
+
+        statement, parameters, _, engine = max(selects, key=lambda entry: entry[2])
+        self._executor.submit(self._explain, record, engine, statement, parameters)
+
+    def _explain(self, record: Dict, engine, statement: str, parameters):
+        start = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                transaction = connection.begin()
+                try:
+                    connection.exec_driver_sql(
+                        f"SET LOCAL statement_timeout = {int(settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS)}"
+                    )
+                    rows = connection.exec_driver_sql(
+                        "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+                    ).fetchall()
+                finally:
+                    transaction.rollback()
+            record["explain"] = {
+                "statement": statement,
+                "plan": "\n".join(row[0] for row in rows),
+                "explain_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+        except Exception as exc:
+            record["explain"] = {"statement": statement, "error": str(exc)}
+        finally:
+            with self._lock:
+                self._explains_in_flight -= 1
+
+    def records(self, limit: Optional[int] = None) -> List[Dict]:
+        """Most recent first"""
+        with self._lock:
+            records = list(reversed(self._records))
+        return records[:limit] if limit is not None else records
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_BUFFER_SIZE)
+
+
+def capture_if_slow(method: str, route: str, duration: float, request_context: RequestContext):
+    if settings.SLOW_REQUEST_THRESHOLD_MS > 0 and duration * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+        slow_query_log.capture(method, route, duration, request_context)
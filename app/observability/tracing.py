@@ -0,0 +1,161 @@
+"""
+Lightweight in-process request tracing
+
+Every request gets a trace id (returned as X-Trace-Id). A TRACE_SAMPLE_RATE
+fraction of requests also record spans: the request itself, auth dependency
+resolution, each SQL statement and each embedding call. Finished traces are
+kept in a ring buffer (served by /admin/traces) and, if TRACE_FILE is set,
+appended to a rotating JSONL file by a background listener thread.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.config import settings
+from app.observability.context import current_request
+
+_file_logger: Optional[logging.Logger] = None
+_file_logger_lock = threading.Lock()
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class Trace:
+    """Spans recorded for one sampled request, with offsets relative to its start"""
+
+    __slots__ = ("trace_id", "started_at", "start", "spans", "_stack")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._stack: List[int] = []  # ids of open spans, innermost last
+
+    def _new_span(self, name: str, kind: str, start: float, attributes: Optional[Dict]) -> Dict:
+        span = {
+            "id": len(self.spans),
+            "parent_id": self._stack[-1] if self._stack else None,
+            "name": name,
+            "kind": kind,
+            "start_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": None,
+            "attributes": attributes or {},
+        }
+        self.spans.append(span)
+        return span
+
+    def add_span(self, name: str, kind: str, start: float, end: float, attributes: Optional[Dict] = None):
+        """Record a finished span; start and end are time.perf_counter() values"""
+        span = self._new_span(name, kind, start, attributes)
+        span["duration_ms"] = round((end - start) * 1000, 3)
+
+    @contextmanager
+    def open_span(self, name: str, kind: str, attributes: Optional[Dict] = None):
+        """Time the block as a span that encloses any spans recorded inside it"""
+        start = time.perf_counter()
+        span = self._new_span(name, kind, start, attributes)
+        self._stack.append(span["id"])
+        try:
+            yield span
+        finally:
+            self._stack.pop()
+            span["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    def to_dict(self, method: str, route: str, status_code: int) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at.isoformat(),
+            "method": method,
+            "route": route,
+            "status": status_code,
+            "duration_ms": self.spans[0]["duration_ms"] if self.spans else None,
+            "spans": self.spans,
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    request_context = current_request.get()
+    return request_context.trace if request_context is not None else None
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Record the block as a span of the current request's trace, if it is sampled"""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    with trace.open_span(name, kind, attributes) as recorded:
+        yield recorded
+
+
+class TraceStore:
+    """Ring buffer of finished traces, optionally mirrored to a JSONL file"""
+
+    def __init__(self, maxlen: int):
+        self._traces = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Dict):
+        with self._lock:
+            self._traces.append(trace)
+        if settings.TRACE_FILE:
+            _trace_file_logger().info(json.dumps(trace, default=str))
+
+    def get(self, trace_id: str) -> Optional[Dict]:
+        with self._lock:
+            for trace in self._traces:
+                if trace["trace_id"] == trace_id:
+                    return trace
+        return None
+
+    def summaries(self, limit: int, route: Optional[str] = None) -> List[Dict]:
+        """Most recent first, without spans"""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        if route:
+            traces = [trace for trace in traces if trace["route"] == route]
+        return [
+            {key: value for key, value in trace.items() if key != "spans"} | {"span_count": len(trace["spans"])}
+            for trace in traces[:limit]
+        ]
+
+
+def _trace_file_logger() -> logging.Logger:
+    """Logger writing raw JSON lines to TRACE_FILE from a background thread"""
+    global _file_logger
+    with _file_logger_lock:
+        if _file_logger is None:
+            file_handler = logging.handlers.RotatingFileHandler(
+                settings.TRACE_FILE,
+                maxBytes=settings.TRACE_FILE_MAX_BYTES,
+                backupCount=settings.TRACE_FILE_BACKUPS
+            )
+            file_handler.setFormatter(logging.Formatter("%(message)s"))
+
+            trace_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(trace_queue, file_handler)
+            listener.start()
+            atexit.register(listener.stop)
+
+            logger = logging.getLogger("app.traces")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(logging.handlers.QueueHandler(trace_queue))
+            _file_logger = logger
+    return _file_logger
+
+
+trace_store = TraceStore(settings.TRACE_BUFFER_SIZE)
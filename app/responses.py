@@ -0,0 +1,142 @@
+"""
+Fast response path for list endpoints
+"""
+
+from typing import Any, Dict, List, Optional, Type
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, TypeAdapter
+import msgpack
+
+# Compact list encodings a client can ask for with the Accept header.
+# Both use the columnar layout: {"columns": [...], "rows": [[...], ...]}
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.library.columnar+json"
+
+# OpenAPI description of the alternative encodings, for list routes' responses=
+LIST_RESPONSES = {
+    200: {
+        "description": (
+            "JSON list by default. Send `Accept: application/msgpack` or "
+            f"`Accept: {COLUMNAR_JSON_MEDIA_TYPE}` for the columnar layout "
+            '`{"columns": [...], "rows": [[...]]}`; nested objects are flattened '
+            "into dotted column names (e.g. `inventory.total_copies`)."
+        ),
+        "content": {MSGPACK_MEDIA_TYPE: {}, COLUMNAR_JSON_MEDIA_TYPE: {}},
+    }
+}
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def to_columnar(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Convert a list of records to {"columns": [...], "rows": [[...]]}.
+
+    Keys are written once instead of per row, and nested objects (such as
+    inventory) are flattened into dotted columns; a row whose nested object
+    is null gets null in each of its columns.
+    """
+    nested: Dict[str, List[str]] = {}
+    keys: List[str] = []
+    for row in rows:
+        for key, value in row.items():
+            if key not in keys:
+                keys.append(key)
+            if isinstance(value, dict):
+                sub_keys = nested.setdefault(key, [])
+                for sub_key in value:
+                    if sub_key not in sub_keys:
+                        sub_keys.append(sub_key)
+
+    columns = []
+    for key in keys:
+        if key in nested:
+            columns.extend(f"{key}.{sub_key}" for sub_key in nested[key])
+        else:
+            columns.append(key)
+
+    encoded_rows = []
+    for row in rows:
+        values = []
+        for key in keys:
+            value = row.get(key)
+            if key in nested:
+                values.extend((value or {}).get(sub_key) for sub_key in nested[key])
+            else:
+                values.append(value)
+        encoded_rows.append(values)
+
+    return {"columns": columns, "rows": encoded_rows}
+
+
+def negotiate_media_type(request: Optional[Request]) -> str:
+    """
+    Pick the list encoding the Accept header prefers most by q-value, ties
+    going to the first listed. application/json and wildcards count as JSON,
+    which is also the answer when nothing else is acceptable.
+    """
+    if request is None:
+        return "application/json"
+
+    best_media_type, best_quality = "application/json", 0.0
+    for media_range in request.headers.get("accept", "").split(","):
+        media_type, *params = (part.strip().lower() for part in media_range.split(";"))
+        if media_type in (MSGPACK_MEDIA_TYPE, COLUMNAR_JSON_MEDIA_TYPE):
+            candidate = media_type
+        elif media_type in ("application/json", "application/*", "*/*"):
+            candidate = "application/json"
+        else:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality:
+            best_media_type, best_quality = candidate, quality
+
+    return best_media_type
+
+
+class ListSerializer:
+    """
+    Serialize a page of row mappings against a response schema.
+
+    The whole page is checked against the schema by a single TypeAdapter call
+    instead of one model_validate per item. Rows built from projected queries
+    already hold JSON-native values, so they are encoded as-is with orjson
+    rather than dumped back out of model instances; keys absent from a row
+    (e.g. dropped by fields=) are absent from the output. Endpoints return
+    the response directly, so FastAPI does not validate the page a second
+    time against response_model.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.adapter = TypeAdapter(List[model])
+
+    def to_python(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Check rows against the schema and return them ready for encoding"""
+        self.adapter.validate_python(rows)
+        return rows
+
+    def response(self, rows: List[Dict[str, Any]], request: Optional[Request] = None) -> Response:
+        """Encode rows as JSON, or in the columnar layout the client asked for"""
+        content = self.to_python(rows)
+        media_type = negotiate_media_type(request)
+        headers = {"Vary": "Accept"}
+
+        if media_type == MSGPACK_MEDIA_TYPE:
+            return MsgPackResponse(to_columnar(content), headers=headers)
+        if media_type == COLUMNAR_JSON_MEDIA_TYPE:
+            return ORJSONResponse(to_columnar(content), media_type=COLUMNAR_JSON_MEDIA_TYPE, headers=headers)
+        return ORJSONResponse(content, headers=headers)
@@ -1,17 +1,21 @@
 from app.schemas.schemas import (
     UserBase, UserCreate, UserResponse,
+    LibraryBase, LibraryCreate, LibraryResponse,
     BookBase, BookCreate, BookUpdate, BookResponse,
     BookInventoryBase, BookInventoryCreate, BookInventoryUpdate, BookInventoryResponse,
-    BorrowRecordCreate, BorrowRecordResponse,
+    BookInventoryAdjustment, BookInventoryBulkUpdate, BookInventoryRejection, BookInventoryBulkResult,
+    BorrowRecordCreate, BorrowRecordResponse, BorrowEventResponse,
     Token, TokenData,
-    BookWithInventory
+    BookWithInventory, BookRecommendation
 )
 
 __all__ = [
     "UserBase", "UserCreate", "UserResponse",
+    "LibraryBase", "LibraryCreate", "LibraryResponse",
     "BookBase", "BookCreate", "BookUpdate", "BookResponse",
     "BookInventoryBase", "BookInventoryCreate", "BookInventoryUpdate", "BookInventoryResponse",
-    "BorrowRecordCreate", "BorrowRecordResponse",
+    "BookInventoryAdjustment", "BookInventoryBulkUpdate", "BookInventoryRejection", "BookInventoryBulkResult",
+    "BorrowRecordCreate", "BorrowRecordResponse", "BorrowEventResponse",
     "Token", "TokenData",
-    "BookWithInventory"
+    "BookWithInventory", "BookRecommendation"
 ]
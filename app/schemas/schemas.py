@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from app.models.models import UserType
+from pydantic import BaseModel, EmailStr, model_validator
+from typing import List, Optional
+from datetime import datetime
+from app.models.models import UserType, BorrowEventKind
 
 
 class UserBase(BaseModel):
@@ -21,6 +22,22 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class LibraryBase(BaseModel):
+    name: str
+    address: Optional[str] = None
+
+
+class LibraryCreate(LibraryBase):
+    pass
+
+
+class LibraryResponse(LibraryBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
 class BookBase(BaseModel):
     title: str
     author: str
@@ -69,17 +86,47 @@ class BookInventoryUpdate(BaseModel):
 
 class BookInventoryResponse(BookInventoryBase):
     id: int
+    library_id: int
 
     class Config:
         from_attributes = True
 
 
+class BookInventoryAdjustment(BaseModel):
+    """Set total_copies to an absolute value, or change it by delta"""
+    book_id: int
+    total_copies: Optional[int] = None
+    delta: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_total_or_delta(self):
+        if (self.total_copies is None) == (self.delta is None):
+            raise ValueError("Exactly one of total_copies or delta must be provided")
+        return self
+
+
+class BookInventoryBulkUpdate(BaseModel):
+    adjustments: List[BookInventoryAdjustment]
+
+
+class BookInventoryRejection(BaseModel):
+    book_id: int
+    reason: str
+
+
+class BookInventoryBulkResult(BaseModel):
+    updated: List[BookInventoryResponse] = []
+    created: List[BookInventoryResponse] = []
+    rejected: List[BookInventoryRejection] = []
+
+
 class BorrowRecordCreate(BaseModel):
     book_id: int
 
 
 class BorrowRecordResponse(BaseModel):
     id: int
+    library_id: int
     user_id: int
     book_id: int
     borrow_count: int
@@ -89,6 +136,18 @@ class BorrowRecordResponse(BaseModel):
         from_attributes = True
 
 
+class BorrowEventResponse(BaseModel):
+    id: int
+    library_id: int
+    user_id: int
+    book_id: int
+    kind: BorrowEventKind
+    at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class BookWithInventory(BookResponse):
     inventory: Optional[BookInventoryResponse] = None
     available_copies: Optional[int] = None
@@ -99,6 +158,10 @@ class BookWithSimilarity(BookWithInventory):
     similarity_score: float
 
 
+class BookRecommendation(BookWithInventory):
+    score: float
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -0,0 +1,151 @@
+"""
+Partition maintenance for the borrow_events log
+
+borrow_events is range partitioned by calendar month (UTC) into tables named
+borrow_events_yYYYYmMM, with borrow_events_default catching anything else.
+Maintenance:
+
+  - creates the partitions for this month and the next
+    BORROW_EVENTS_PREMAKE_MONTHS, moving any rows for that range out of the
+    default partition first
+  - detaches partitions that ended more than BORROW_EVENTS_RETENTION_MONTHS
+    ago and moves them to the BORROW_EVENTS_ARCHIVE_SCHEMA schema (a
+    metadata-only change; dump and drop them from there), or drops them if
+    no archive schema is set
+
+It runs in a background thread every BORROW_EVENTS_MAINTENANCE_INTERVAL_S and
+can be run from cron with `python -m app.services.borrow_events`. An advisory
+lock keeps concurrent runs from several workers apart.
+"""
+
+import logging
+import re
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.config import settings
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+PARENT = "borrow_events"
+DEFAULT_PARTITION = "borrow_events_default"
+_PARTITION_NAME = re.compile(r"^borrow_events_y(\d{4})m(\d{2})$")
+
+# pg_try_advisory_xact_lock key, so only one worker runs maintenance at a time
+MAINTENANCE_LOCK_ID = 0x626f72726f77
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def _bound(month: date) -> str:
+    return f"{month.isoformat()} 00:00:00+00"
+
+
+def monthly_partitions(conn: Connection) -> Dict[date, str]:
+    """Attached monthly partitions by first day of month"""
+    rows = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:parent AS regclass)
+    """), {"parent": PARENT}).scalars()
+    partitions = {}
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+
+def create_partition(conn: Connection, month: date):
+    """
+    Create the month's partition. Rows already in the default partition for
+    that month are moved over, since Postgres will not attach a range that
+    the default partition holds rows for. The default partition is locked
+    against writes first (for the rest of the caller's transaction), so a
+    borrow committing mid-move cannot leave a row behind that fails the attach.
+    """
+    name = _partition_name(month)
+    start, end = _bound(month), _bound(_add_months(month, 1))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN SHARE ROW EXCLUSIVE MODE"))
+    moved = conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE at >= :start AND at < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": start, "end": end}).rowcount
+    conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"))
+    logger.info(f"Created partition {name}" + (f" ({moved} rows moved from {DEFAULT_PARTITION})" if moved else ""))
+
+
+def archive_partition(conn: Connection, name: str):
+    conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+    if settings.BORROW_EVENTS_ARCHIVE_SCHEMA:
+        schema = settings.BORROW_EVENTS_ARCHIVE_SCHEMA
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+        logger.info(f"Archived partition {name} to schema {schema}")
+    else:
+        conn.execute(text(f"DROP TABLE {name}"))
+        logger.info(f"Dropped partition {name}")
+
+
+def run_maintenance(today: date = None) -> List[str]:
+    """Create upcoming partitions and archive expired ones; returns the actions taken"""
+    today = today or datetime.now(timezone.utc).date()
+    this_month = today.replace(day=1)
+    actions = []
+
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": MAINTENANCE_LOCK_ID}).scalar():
+            return actions
+
+        existing = monthly_partitions(conn)
+        for offset in range(settings.BORROW_EVENTS_PREMAKE_MONTHS + 1):
+            month = _add_months(this_month, offset)
+            if month not in existing:
+                create_partition(conn, month)
+                actions.append(f"created {_partition_name(month)}")
+
+        if settings.BORROW_EVENTS_RETENTION_MONTHS > 0:
+            # Keep whole months: a partition goes once its last day is past the retention window
+            cutoff = _add_months(this_month, -settings.BORROW_EVENTS_RETENTION_MONTHS)
+            for month, name in sorted(existing.items()):
+                if _add_months(month, 1) <= cutoff:
+                    archive_partition(conn, name)
+                    actions.append(f"archived {name}")
+
+    return actions
+
+
+def _maintenance_loop():
+    while True:
+        try:
+            run_maintenance()
+        except Exception as e:
+            logger.warning(f"borrow_events partition maintenance failed: {e}")
+        time.sleep(settings.BORROW_EVENTS_MAINTENANCE_INTERVAL_S)
+
+
+def start_partition_maintenance():
+    """Run maintenance now and then every BORROW_EVENTS_MAINTENANCE_INTERVAL_S (0 disables)"""
+    if settings.BORROW_EVENTS_MAINTENANCE_INTERVAL_S > 0:
+        threading.Thread(target=_maintenance_loop, name="borrow-events-maintenance", daemon=True).start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for action in run_maintenance() or ["nothing to do"]:
+        print(action)
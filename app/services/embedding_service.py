@@ -1,16 +1,26 @@
 """
 Embedding service using Google Vertex AI
+
+With EMBEDDING_BACKEND=stub, embeddings are deterministic pseudo-random unit
+vectors derived from the text instead, for load tests and local development
+without GCP credentials. They are stored under the model name "stub-768",
+so switching back to Vertex AI re-embeds each book on its next update.
 """
 
+from collections import OrderedDict
 from typing import List, Optional
-from google.cloud import aiplatform
-from vertexai.language_models import TextEmbeddingModel
-import vertexai
 import base64
+import hashlib
 import json
+import math
+import random
 import tempfile
+import threading
+import time
 import os
 from app.config import settings
+from app.observability.metrics import CACHE_REQUESTS, EMBEDDING_DURATION, EMBEDDING_ERRORS
+from app.observability.tracing import span
 
 
 class EmbeddingService:
@@ -18,10 +28,22 @@ class EmbeddingService:
 
     def __init__(self):
         """Initialize Vertex AI with project and location"""
-        self.model_name = "text-embedding-004"
+        self.dimension = 768
+        # Stub vectors are stored under their own model name so they are never
+        # mistaken for current Vertex embeddings once the real backend is back
+        self.vertex_model_name = "text-embedding-004"
+        if settings.EMBEDDING_BACKEND == "stub":
+            self.model_name = f"stub-{self.dimension}"
+        else:
+            self.model_name = self.vertex_model_name
         self.initialized = False
+        self._init_lock = threading.Lock()
         self.temp_creds_file = None
 
+        # LRU cache of recent search query embeddings
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
     def _setup_credentials(self):
         """Set up Google Cloud credentials from base64 encoded string if available"""
         # If base64 credentials are provided, decode and set up temp file
@@ -55,8 +77,18 @@ class EmbeddingService:
 
     def _initialize(self):
         """Lazy initialization of Vertex AI"""
-        if not self.initialized:
+        if self.initialized:
+            return
+        # The warm-up thread and the first requests can get here together; only one initializes
+        with self._init_lock:
+            if self.initialized:
+                return
             try:
+                # The Vertex AI SDK takes seconds to import, so it is only
+                # imported on the first embedding call, not at app startup
+                import vertexai
+                from vertexai.language_models import TextEmbeddingModel
+
                 # Set up credentials first
                 if not self._setup_credentials():
                     print("Warning: Failed to set up credentials")
@@ -67,7 +99,7 @@ class EmbeddingService:
                     project=settings.GOOGLE_CLOUD_PROJECT,
                     location=settings.GOOGLE_CLOUD_LOCATION
                 )
-                self.model = TextEmbeddingModel.from_pretrained(self.model_name)
+                self.model = TextEmbeddingModel.from_pretrained(self.vertex_model_name)
                 self.initialized = True
                 print(f"✅ Vertex AI initialized successfully (project: {settings.GOOGLE_CLOUD_PROJECT}, location: {settings.GOOGLE_CLOUD_LOCATION})")
             except Exception as e:
@@ -75,6 +107,13 @@ class EmbeddingService:
                 print("Embeddings will not be generated. Check your GCP credentials.")
                 self.initialized = False
 
+    def warm_up(self) -> bool:
+        """Initialize Vertex AI ahead of the first request; returns True if the model is ready"""
+        if settings.EMBEDDING_BACKEND == "stub":
+            return True
+        self._initialize()
+        return self.initialized
+
     def __del__(self):
         """Clean up temporary credentials file if created"""
         if self.temp_creds_file and os.path.exists(self.temp_creds_file):
@@ -83,6 +122,28 @@ class EmbeddingService:
             except Exception:
                 pass
 
+    def book_text(
+        self,
+        title: str,
+        author: str,
+        summary: Optional[str] = None,
+        genre: Optional[str] = None
+    ) -> str:
+        """Combine book information into the single text that gets embedded"""
+        text_parts = [f"Title: {title}", f"Author: {author}"]
+
+        if genre:
+            text_parts.append(f"Genre: {genre}")
+
+        if summary:
+            text_parts.append(f"Summary: {summary}")
+
+        return " | ".join(text_parts)
+
+    def content_hash(self, text: str) -> str:
+        """SHA-256 of the embedded text, used to skip re-embedding unchanged books"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
     def generate_embedding(
         self,
         title: str,
@@ -102,52 +163,67 @@ class EmbeddingService:
         Returns:
             List of floats representing the embedding, or None if generation fails
         """
-        self._initialize()
-
-        if not self.initialized:
-            return None
-
-        try:
-            # Combine book information into a single text
-            text_parts = [f"Title: {title}", f"Author: {author}"]
-
-            if genre:
-                text_parts.append(f"Genre: {genre}")
-
-            if summary:
-                text_parts.append(f"Summary: {summary}")
-
-            text = " | ".join(text_parts)
-
-            # Generate embedding
-            embeddings = self.model.get_embeddings([text])
-
-            if embeddings and len(embeddings) > 0:
-                return embeddings[0].values
-
-            return None
-
-        except Exception as e:
-            print(f"Error generating embedding: {e}")
-            return None
+        return self._embed("book", self.book_text(title, author, summary, genre))
 
     def generate_query_embedding(self, query: str) -> Optional[List[float]]:
         """
         Generate embedding for a search query.
 
+        Recently seen queries are served from an in-memory LRU cache
+        (EMBEDDING_QUERY_CACHE_SIZE entries) without calling Vertex AI.
+
         Args:
             query: Search query text
 
         Returns:
             List of floats representing the embedding, or None if generation fails
         """
-        self._initialize()
-
-        if not self.initialized:
-            return None
-
+        cache_key = query.strip()
+
+        with self._query_cache_lock:
+            cached = self._query_cache.get(cache_key)
+            if cached is not None:
+                self._query_cache.move_to_end(cache_key)
+
+        if cached is not None:
+            CACHE_REQUESTS.inc("query_embedding", "hit")
+            return cached
+        CACHE_REQUESTS.inc("query_embedding", "miss")
+
+        embedding = self._embed("query", query)
+
+        if embedding and settings.EMBEDDING_QUERY_CACHE_SIZE > 0:
+            with self._query_cache_lock:
+                self._query_cache[cache_key] = embedding
+                while len(self._query_cache) > settings.EMBEDDING_QUERY_CACHE_SIZE:
+                    self._query_cache.popitem(last=False)
+
+        return embedding
+
+    def _stub_embedding(self, text: str) -> List[float]:
+        """Deterministic unit vector derived from the text, for EMBEDDING_BACKEND=stub"""
+        rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimension)]
+        norm = math.sqrt(sum(x * x for x in vector))
+        return [x / norm for x in vector]
+
+    def _embed(self, operation: str, text: str) -> Optional[List[float]]:
+        """Call the embedding model for one text, recording latency and errors"""
+        stub = settings.EMBEDDING_BACKEND == "stub"
+        if not stub:
+            self._initialize()
+
+            if not self.initialized:
+                EMBEDDING_ERRORS.inc(operation)
+                return None
+
+        start = time.perf_counter()
         try:
-            embeddings = self.model.get_embeddings([query])
+            # Generate embedding
+            with span(f"embedding.{operation}", "embedding", model=self.model_name, characters=len(text)):
+                if stub:
+                    return self._stub_embedding(text)
+                embeddings = self.model.get_embeddings([text])
 
             if embeddings and len(embeddings) > 0:
                 return embeddings[0].values
@@ -155,9 +231,13 @@ class EmbeddingService:
             return None
 
         except Exception as e:
-            print(f"Error generating query embedding: {e}")
+            EMBEDDING_ERRORS.inc(operation)
+            print(f"Error generating {operation} embedding: {e}")
             return None
 
+        finally:
+            EMBEDDING_DURATION.observe(time.perf_counter() - start, operation)
+
 
 # Global instance
 embedding_service = EmbeddingService()
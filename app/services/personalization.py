@@ -0,0 +1,117 @@
+"""
+Per-user taste vectors and personalized reranking
+
+Each borrow folds the book's stored embedding into the user's profile in
+O(d): the existing sum and weight are decayed by the time since the last
+update (half-life PERSONALIZATION_HALF_LIFE_DAYS) and the new vector is
+added, so no history is replayed. Reranking scores a candidate set against
+the profile with one matrix-vector product.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.models import BookEmbedding, UserProfile
+from app.services.embedding_service import embedding_service
+
+
+def update_profile(db: Session, user_id: int, book_id: int):
+    """Add a borrowed book to the user's profile; part of the caller's transaction"""
+    model = embedding_service.model_name
+    vector = db.query(BookEmbedding.vector).filter(
+        BookEmbedding.book_id == book_id,
+        BookEmbedding.model == model
+    ).scalar()
+    if vector is None:
+        return
+
+    # First borrow: the profile is the book. Inserting first means concurrent
+    # borrows by the same user never race to create the row.
+    created = db.execute(
+        pg_insert(UserProfile).values(
+            user_id=user_id,
+            model=model,
+            vector=vector,
+            weight=1.0
+        ).on_conflict_do_nothing().returning(UserProfile.user_id)
+    ).first()
+    if created:
+        return
+
+    profile = db.query(UserProfile).filter(
+        UserProfile.user_id == user_id,
+        UserProfile.model == model
+    ).with_for_update().one()
+
+    now = datetime.now(timezone.utc)
+    elapsed_days = max((now - profile.updated_at).total_seconds(), 0) / 86400
+    decay = 0.5 ** (elapsed_days / settings.PERSONALIZATION_HALF_LIFE_DAYS)
+    profile.vector = np.asarray(profile.vector, dtype=np.float32) * decay + np.asarray(vector, dtype=np.float32)
+    profile.weight = profile.weight * decay + 1.0
+    profile.updated_at = now
+
+
+def get_profile(db: Session, user_id: int) -> Optional[np.ndarray]:
+    """The user's unit-length taste vector for the active model, if they have borrowed an embedded book"""
+    vector = db.query(UserProfile.vector).filter(
+        UserProfile.user_id == user_id,
+        UserProfile.model == embedding_service.model_name
+    ).scalar()
+    if vector is None:
+        return None
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+def book_vectors(db: Session, book_ids: List[int]) -> Dict[int, np.ndarray]:
+    """Stored embeddings of the given books for the active model"""
+    if not book_ids:
+        return {}
+    rows = db.query(BookEmbedding.book_id, BookEmbedding.vector).filter(
+        BookEmbedding.book_id.in_(book_ids),
+        BookEmbedding.model == embedding_service.model_name
+    ).all()
+    return {row.book_id: row.vector for row in rows}
+
+
+def profile_similarities(profile: np.ndarray, vectors: List) -> np.ndarray:
+    """Cosine similarity of each candidate vector to the (unit) profile, as one matrix-vector product"""
+    matrix = np.asarray(np.vstack(vectors), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1
+    return (matrix @ profile) / norms
+
+
+def rerank(
+    profile: np.ndarray,
+    book_ids: List[int],
+    vectors: Dict[int, np.ndarray],
+    query_scores: Optional[Dict[int, float]] = None
+) -> List[int]:
+    """
+    Order candidates by (1 - w) * query similarity + w * profile similarity,
+    w = PERSONALIZATION_WEIGHT. Without query scores (text search) the
+    profile similarity alone decides. Books without an embedding keep their
+    query score, or go last in their original order.
+    """
+    embedded = [book_id for book_id in book_ids if book_id in vectors]
+    if not embedded:
+        return list(book_ids)
+
+    similarity = dict(zip(embedded, profile_similarities(profile, [vectors[book_id] for book_id in embedded])))
+    weight = settings.PERSONALIZATION_WEIGHT
+
+    def score(book_id: int) -> float:
+        if query_scores is None:
+            return float(similarity.get(book_id, -np.inf))
+        query_score = query_scores[book_id]
+        if book_id not in similarity:
+            return query_score
+        return (1 - weight) * query_score + weight * float(similarity[book_id])
+
+    # sorted() is stable, so ties and unembedded books keep the original order
+    return sorted(book_ids, key=score, reverse=True)
@@ -0,0 +1,305 @@
+"""
+Item-to-item collaborative filtering recommendations
+
+Rebuild (`python -m app.services.recommendations`, e.g. nightly from cron):
+
+  - borrow_records is read with a binary COPY into a sparse user x book
+    matrix R, weighted by log(1 + borrow_count) so rereads count but do not
+    dominate
+  - book-book cosine similarity is R's column-normalized Gram matrix, computed
+    RECOMMENDATIONS_BLOCK_SIZE books at a time; each book keeps its
+    RECOMMENDATIONS_NEIGHBORS_K best in co_borrowed_books
+  - each user's scores are their row of R times that neighbour matrix, minus
+    books they have already borrowed; the top RECOMMENDATIONS_K go to
+    user_recommendations
+
+Rows are replaced one block of ids per transaction, so readers never wait on
+the rebuild and always see a complete list per user.
+
+Between rebuilds a background thread picks up members who borrowed since its
+last pass (from borrow_events) every RECOMMENDATIONS_REFRESH_INTERVAL_S and
+rescores them in SQL from the stored neighbour lists. Users with no stored
+list are scored the same way on request.
+"""
+
+import io
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING, Dict, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import engine
+
+# numpy and scipy are only needed by the rebuild and are imported there, so the
+# API (which imports this module for the refresh thread) does not pay for scipy
+if TYPE_CHECKING:
+    import numpy as np
+    from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key shared by the rebuild and the incremental refresh
+RECOMMENDATIONS_LOCK_ID = 0x7265636f6d6d
+
+# Postgres binary COPY framing: signature, flags, header extension length / end-of-data marker
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + b"\x00" * 8
+COPY_TRAILER = b"\xff\xff"
+
+LOAD_BORROWS_SQL = """
+    COPY (
+        SELECT user_id, book_id, sum(borrow_count)::integer
+        FROM borrow_records
+        GROUP BY user_id, book_id
+    ) TO STDOUT WITH (FORMAT binary)
+"""
+
+# Same scoring as the rebuild, for a handful of users, from the stored neighbour lists
+RECOMMEND_SQL = """
+    WITH history AS (
+        SELECT user_id, book_id, ln(1 + sum(borrow_count)) AS weight
+        FROM borrow_records
+        WHERE user_id = ANY(:user_ids)
+        GROUP BY user_id, book_id
+    ),
+    scored AS (
+        SELECT h.user_id, n.neighbor_id AS book_id, sum(h.weight * n.score) AS score
+        FROM history h
+        JOIN co_borrowed_books n ON n.book_id = h.book_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM history seen WHERE seen.user_id = h.user_id AND seen.book_id = n.neighbor_id
+        )
+        GROUP BY h.user_id, n.neighbor_id
+    ),
+    ranked AS (
+        SELECT user_id, book_id, score, row_number() OVER (PARTITION BY user_id ORDER BY score DESC) AS position
+        FROM scored
+    )
+    SELECT user_id, book_id, score FROM ranked WHERE position <= :k
+"""
+
+
+def _copy_out(cursor, statement: str, columns: List[Tuple[str, str]]) -> "np.ndarray":
+    """Run a binary COPY TO of fixed-width, non-null columns and parse it without a Python loop"""
+    import numpy as np
+
+    buffer = io.BytesIO()
+    cursor.copy_expert(statement, buffer)
+    body = buffer.getvalue()[len(COPY_HEADER):-len(COPY_TRAILER)]
+    dtype = [("field_count", ">i2")]
+    for name, kind in columns:
+        dtype += [(f"{name}_length", ">i4"), (name, kind)]
+    return np.frombuffer(body, dtype=dtype)
+
+
+def _copy_in(cursor, table: str, columns: List[Tuple[str, str, "np.ndarray"]]):
+    """Binary COPY FROM of equal-length arrays: (column, big-endian numpy type, values)"""
+    import numpy as np
+
+    dtype = [("field_count", ">i2")]
+    for name, kind, _ in columns:
+        dtype += [(f"{name}_length", ">i4"), (name, kind)]
+    rows = np.empty(len(columns[0][2]), dtype=dtype)
+    rows["field_count"] = len(columns)
+    for name, kind, values in columns:
+        rows[f"{name}_length"] = np.dtype(kind).itemsize
+        rows[name] = values
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(name for name, _, _ in columns)}) FROM STDIN WITH (FORMAT binary)",
+        io.BytesIO(COPY_HEADER + rows.tobytes() + COPY_TRAILER)
+    )
+
+
+def _top_k_per_row(matrix: "sparse.csr_matrix", k: int) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """(row, column, value) of the k largest stored values in each row"""
+    import numpy as np
+
+    matrix.eliminate_zeros()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((-matrix.data, rows))
+    # Sorting keeps rows grouped in order, so a row's entries still start at indptr[row]
+    rank = np.arange(len(order)) - matrix.indptr[rows]
+    keep = order[rank < k]
+    return rows[keep], matrix.indices[keep], matrix.data[keep]
+
+
+def _replace_block(connection, table: str, key: str, start: int, end: int, columns):
+    """Swap one id range of a table for new rows in a single transaction"""
+    cursor = connection.cursor()
+    if end is None:
+        cursor.execute(f"DELETE FROM {table} WHERE {key} >= %s", (start,))
+    else:
+        cursor.execute(f"DELETE FROM {table} WHERE {key} >= %s AND {key} < %s", (start, end))
+    if len(columns[0][2]):
+        _copy_in(cursor, table, columns)
+    connection.commit()
+
+
+def load_borrow_matrix(cursor) -> "sparse.csr_matrix":
+    """Users x books, log(1 + borrow_count) per cell; row and column indexes are the ids"""
+    import numpy as np
+    from scipy import sparse
+
+    borrows = _copy_out(cursor, LOAD_BORROWS_SQL, [("user_id", ">i4"), ("book_id", ">i4"), ("count", ">i4")])
+    if not len(borrows):
+        return sparse.csr_matrix((0, 0), dtype=np.float32)
+    return sparse.csr_matrix(
+        (np.log1p(borrows["count"]).astype(np.float32), (borrows["user_id"], borrows["book_id"])),
+        shape=(int(borrows["user_id"].max()) + 1, int(borrows["book_id"].max()) + 1)
+    )
+
+
+def book_neighbors(connection, borrows: "sparse.csr_matrix") -> "sparse.csr_matrix":
+    """Compute and store each book's top neighbours; returns them as a books x books matrix"""
+    import numpy as np
+    from scipy import sparse
+
+    block_size = settings.RECOMMENDATIONS_BLOCK_SIZE
+    n_books = borrows.shape[1]
+
+    norms = np.sqrt(np.asarray(borrows.multiply(borrows).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = (borrows @ sparse.diags(1 / norms)).tocsr().astype(np.float32)
+    by_book = normalized.T.tocsr()
+
+    blocks = []
+    for start in range(0, n_books, block_size):
+        end = min(start + block_size, n_books)
+        similarity = (by_book[start:end] @ normalized).tocsr()
+        # A book is not its own neighbour
+        similarity = similarity - similarity.multiply(sparse.eye(end - start, n_books, k=start, format="csr"))
+        rows, columns, scores = _top_k_per_row(similarity.tocsr(), settings.RECOMMENDATIONS_NEIGHBORS_K)
+        rows += start
+        _replace_block(connection, "co_borrowed_books", "book_id", start, end if end < n_books else None, [
+            ("book_id", ">i4", rows), ("neighbor_id", ">i4", columns), ("score", ">f8", scores),
+        ])
+        blocks.append((rows, columns, scores))
+
+    if not blocks:
+        return sparse.csr_matrix((n_books, n_books), dtype=np.float32)
+    rows, columns, scores = (np.concatenate(parts) for parts in zip(*blocks))
+    return sparse.csr_matrix((scores, (rows, columns)), shape=(n_books, n_books))
+
+
+def user_recommendations(connection, borrows: "sparse.csr_matrix", neighbors: "sparse.csr_matrix") -> int:
+    """Score and store every user's top recommendations; returns the number of rows written"""
+    block_size = settings.RECOMMENDATIONS_BLOCK_SIZE
+    n_users = borrows.shape[0]
+    written = 0
+
+    for start in range(0, n_users, block_size):
+        end = min(start + block_size, n_users)
+        history = borrows[start:end]
+        scores = (history @ neighbors).tocsr()
+        seen = history.copy()
+        seen.data[:] = 1
+        scores = (scores - scores.multiply(seen)).tocsr()
+        rows, book_ids, values = _top_k_per_row(scores, settings.RECOMMENDATIONS_K)
+        rows += start
+        _replace_block(connection, "user_recommendations", "user_id", start, end if end < n_users else None, [
+            ("user_id", ">i4", rows), ("book_id", ">i4", book_ids), ("score", ">f8", values),
+        ])
+        written += len(rows)
+
+    return written
+
+
+def rebuild() -> Dict[str, float]:
+    """Recompute co_borrowed_books and user_recommendations from all of borrow_records"""
+    started = time.perf_counter()
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (RECOMMENDATIONS_LOCK_ID,))
+        if not cursor.fetchone()[0]:
+            logger.info("Recommendations rebuild already running elsewhere; skipping")
+            return {}
+        try:
+            borrows = load_borrow_matrix(cursor)
+            connection.commit()
+            loaded = time.perf_counter()
+            neighbors = book_neighbors(connection, borrows)
+            paired = time.perf_counter()
+            written = user_recommendations(connection, borrows, neighbors)
+        finally:
+            connection.rollback()
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (RECOMMENDATIONS_LOCK_ID,))
+            connection.commit()
+    finally:
+        connection.close()
+
+    stats = {
+        "borrow_pairs": borrows.nnz,
+        "book_neighbor_rows": neighbors.nnz,
+        "user_recommendation_rows": written,
+        "load_s": round(loaded - started, 1),
+        "book_neighbors_s": round(paired - loaded, 1),
+        "user_recommendations_s": round(time.perf_counter() - paired, 1),
+    }
+    logger.info(f"Rebuilt recommendations: {stats}")
+    return stats
+
+
+def recommend_for_user(db: Session, user_id: int, limit: int) -> List:
+    """Score one user on demand from the stored neighbour lists: (id, score) rows, best first"""
+    rows = db.execute(text(RECOMMEND_SQL), {"user_ids": [user_id], "k": limit}).fetchall()
+    return sorted(((row.book_id, row.score) for row in rows), key=lambda row: row[1], reverse=True)
+
+
+def refresh_recent(since) -> Tuple[int, object]:
+    """
+    Rescore users who borrowed after `since`; returns (users refreshed, new watermark).
+
+    borrow_events.at is the borrowing transaction's start time, so a borrow
+    can commit after a pass whose watermark is already past it. Each pass
+    rescans RECOMMENDATIONS_REFRESH_OVERLAP_S before `since` to pick those
+    up; rescoring a user twice just replaces their list with the same rows.
+    """
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RECOMMENDATIONS_LOCK_ID}).scalar():
+            return 0, since
+        until = conn.execute(text("SELECT now()")).scalar()
+        since_with_overlap = since - timedelta(seconds=settings.RECOMMENDATIONS_REFRESH_OVERLAP_S)
+        user_ids = conn.execute(text("""
+            SELECT DISTINCT user_id FROM borrow_events
+            WHERE at > :since AND at <= :until AND kind = 'BORROW'
+        """), {"since": since_with_overlap, "until": until}).scalars().all()
+        if user_ids:
+            conn.execute(text("DELETE FROM user_recommendations WHERE user_id = ANY(:user_ids)"), {"user_ids": user_ids})
+            conn.execute(
+                text("INSERT INTO user_recommendations (user_id, book_id, score) " + RECOMMEND_SQL),
+                {"user_ids": user_ids, "k": settings.RECOMMENDATIONS_K}
+            )
+    return len(user_ids), until
+
+
+def _refresh_loop():
+    since = None
+    while True:
+        time.sleep(settings.RECOMMENDATIONS_REFRESH_INTERVAL_S)
+        try:
+            if since is None:
+                # Resume from the newest stored recommendation
+                with engine.connect() as conn:
+                    since = conn.execute(text(
+                        "SELECT coalesce(max(computed_at), now()) FROM user_recommendations"
+                    )).scalar()
+            refreshed, since = refresh_recent(since)
+            if refreshed:
+                logger.info(f"Refreshed recommendations for {refreshed} users")
+        except Exception as e:
+            logger.warning(f"Recommendations refresh failed: {e}")
+
+
+def start_recommendation_refresh():
+    """Rescore recent borrowers every RECOMMENDATIONS_REFRESH_INTERVAL_S (0 disables)"""
+    if settings.RECOMMENDATIONS_REFRESH_INTERVAL_S > 0:
+        threading.Thread(target=_refresh_loop, name="recommendations-refresh", daemon=True).start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    for name, value in rebuild().items():
+        print(f"{name:<26}{value:>12,}")
@@ -0,0 +1,149 @@
+"""
+Precomputed "similar books" lists (book_neighbors)
+
+Each book keeps its SIMILAR_BOOKS_K nearest neighbours by stored embedding,
+computed with the same per-model ivfflat index as semantic search. Lists are
+refreshed incrementally when create_book/update_book store a new embedding:
+
+  - lists that contained the book are recomputed, since its old vector no
+    longer applies
+  - the book's own list is recomputed
+  - the book is offered to each of its new neighbours' lists (similarity is
+    symmetric), which are then trimmed back to SIMILAR_BOOKS_K
+
+Books that would rank the changed book highly without being among its own
+nearest neighbours are only picked up by a rebuild, which runs in batches
+with `python -m app.services.similar_books`.
+"""
+
+import argparse
+import logging
+import time
+from typing import List
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.services.embedding_service import embedding_service
+
+logger = logging.getLogger(__name__)
+
+
+def _neighbors_sql(select_columns: str, into: str = ""):
+    """
+    Top-k neighbours of each book in :book_ids by stored embedding.
+
+    The LATERAL subquery orders by the same expression as the per-model
+    partial index, so each book's neighbours come from one index scan. Its
+    model filter is the bound :model rather than e.model: the planner can
+    only match the index predicate against a constant.
+    """
+    vector_expr = f"vector::vector({embedding_service.dimension})"
+    return text(f"""
+        {into}
+        SELECT {select_columns}
+        FROM book_embeddings e
+        CROSS JOIN LATERAL (
+            SELECT
+                o.book_id,
+                1 - (o.{vector_expr} <=> e.{vector_expr}) AS similarity
+            FROM book_embeddings o
+            WHERE o.model = :model AND o.book_id <> e.book_id
+            ORDER BY o.{vector_expr} <=> e.{vector_expr}
+            LIMIT :k
+        ) n
+        WHERE e.model = :model AND e.book_id = ANY(:book_ids)
+    """)
+
+
+def nearest_neighbors(db: Session, book_id: int, limit: int) -> List:
+    """Compute a book's neighbours on demand: (id, similarity) rows, most similar first"""
+    rows = db.execute(
+        _neighbors_sql("n.book_id AS id, n.similarity"),
+        {"model": embedding_service.model_name, "book_ids": [book_id], "k": limit}
+    ).fetchall()
+    return sorted(rows, key=lambda row: row.similarity, reverse=True)
+
+
+def _recompute_lists(db: Session, book_ids: List[int]):
+    params = {"model": embedding_service.model_name, "book_ids": book_ids, "k": settings.SIMILAR_BOOKS_K}
+    db.execute(text("DELETE FROM book_neighbors WHERE model = :model AND book_id = ANY(:book_ids)"), params)
+    db.execute(_neighbors_sql(
+        "e.book_id, e.model, n.book_id, n.similarity",
+        into="INSERT INTO book_neighbors (book_id, model, neighbor_id, similarity)"
+    ), params)
+
+
+def _trim_lists(db: Session, book_ids: List[int]):
+    db.execute(text("""
+        DELETE FROM book_neighbors n
+        USING (
+            SELECT book_id, neighbor_id, row_number() OVER (
+                PARTITION BY book_id ORDER BY similarity DESC
+            ) AS position
+            FROM book_neighbors
+            WHERE model = :model AND book_id = ANY(:book_ids)
+        ) ranked
+        WHERE n.model = :model
+          AND n.book_id = ranked.book_id
+          AND n.neighbor_id = ranked.neighbor_id
+          AND ranked.position > :k
+    """), {"model": embedding_service.model_name, "book_ids": book_ids, "k": settings.SIMILAR_BOOKS_K})
+
+
+def refresh_book_neighbors(db: Session, book_id: int):
+    """Update the stored lists after book_id's embedding changed, and commit"""
+    model = embedding_service.model_name
+    stale = db.execute(text("""
+        DELETE FROM book_neighbors WHERE model = :model AND neighbor_id = :book_id RETURNING book_id
+    """), {"model": model, "book_id": book_id}).scalars().all()
+    _recompute_lists(db, [book_id] + stale)
+
+    # Offer the book to its new neighbours' lists; recomputed lists already have it if it belongs
+    offered = db.execute(text("""
+        INSERT INTO book_neighbors (book_id, model, neighbor_id, similarity)
+        SELECT neighbor_id, model, book_id, similarity
+        FROM book_neighbors
+        WHERE model = :model AND book_id = :book_id AND NOT (neighbor_id = ANY(:stale))
+        ON CONFLICT DO NOTHING
+        RETURNING book_id
+    """), {"model": model, "book_id": book_id, "stale": stale}).scalars().all()
+    if offered:
+        _trim_lists(db, offered)
+
+    db.commit()
+    logger.info(f"Refreshed neighbours of book {book_id} ({len(stale)} stale lists, {len(offered)} offered)")
+
+
+def rebuild_all(db: Session, batch_size: int = 500) -> int:
+    """Recompute every book's list for the active model, committing per batch"""
+    last_id = 0
+    rebuilt = 0
+    while True:
+        book_ids = db.execute(text("""
+            SELECT book_id FROM book_embeddings
+            WHERE model = :model AND book_id > :last_id
+            ORDER BY book_id
+            LIMIT :batch_size
+        """), {"model": embedding_service.model_name, "last_id": last_id, "batch_size": batch_size}).scalars().all()
+        if not book_ids:
+            return rebuilt
+        _recompute_lists(db, book_ids)
+        db.commit()
+        rebuilt += len(book_ids)
+        last_id = book_ids[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the precomputed similar-books lists")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        rebuilt = rebuild_all(db, args.batch_size)
+    finally:
+        db.close()
+    print(f"Rebuilt neighbours of {rebuilt} books in {time.perf_counter() - start:.0f}s")
@@ -0,0 +1,139 @@
+"""
+Startup warm-up and readiness state
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+from sqlalchemy import func, text
+from app.config import settings
+from app.database import engine, SessionLocal
+from app.models.models import Book, BookInventory, User
+from app.services.embedding_service import embedding_service
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """
+    Progress of the startup warm-up, reported by /api/ready.
+
+    The process is ready once the database checks have passed. The embedding
+    model is reported but does not gate readiness: without Vertex AI
+    credentials only semantic search is unavailable.
+    """
+
+    REQUIRED_CHECKS = ("database_pool", "representative_queries")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checks: Dict[str, Dict] = {}
+
+    def set(self, name: str, status: str, duration_ms: Optional[float] = None, error: Optional[str] = None):
+        check = {"status": status}
+        if duration_ms is not None:
+            check["duration_ms"] = round(duration_ms, 1)
+        if error:
+            check["error"] = error
+        with self._lock:
+            self.checks[name] = check
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return all(
+                self.checks.get(name, {}).get("status") == "ok"
+                for name in self.REQUIRED_CHECKS
+            )
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            checks = {name: dict(check) for name, check in self.checks.items()}
+        return {"status": "ready" if self.ready else "starting", "checks": checks}
+
+
+warmup_state = WarmupState()
+
+
+def _run_check(name: str, check: Callable[[], bool]) -> bool:
+    warmup_state.set(name, "running")
+    start = time.perf_counter()
+    try:
+        ok = check()
+    except Exception as e:
+        duration_ms = (time.perf_counter() - start) * 1000
+        warmup_state.set(name, "failed", duration_ms, error=str(e))
+        logger.warning(f"Warm-up check {name} failed after {duration_ms:.0f} ms: {e}")
+        return False
+
+    duration_ms = (time.perf_counter() - start) * 1000
+    warmup_state.set(name, "ok" if ok else "failed", duration_ms)
+    logger.info(f"Warm-up check {name} {'done' if ok else 'failed'} in {duration_ms:.0f} ms")
+    return ok
+
+
+def _warm_pool() -> bool:
+    """Open WARMUP_POOL_CONNECTIONS connections at once so the pool keeps them"""
+    count = max(1, min(settings.WARMUP_POOL_CONNECTIONS, settings.DB_POOL_SIZE))
+    connections = []
+    try:
+        for _ in range(count):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+    return True
+
+
+def _run_representative_queries() -> bool:
+    """Run the hot read queries once so catalog caches and statement caches are warm"""
+    from app.api.books import _book_rows_query, _borrowed_book_ids, _parse_fields
+
+    db = SessionLocal()
+    try:
+        # get_current_user
+        db.query(User).filter(User.email == "").first()
+
+        # list_books page and borrow-status lookup
+        rows = _book_rows_query(db, _parse_fields(None)).limit(20).all()
+        _borrowed_book_ids(db, 0, [row.id for row in rows])
+
+        # get_librarian_stats
+        db.query(func.count(Book.id)).scalar()
+        db.query(func.count(User.id)).scalar()
+        db.query(func.sum(BookInventory.borrowed_copies)).scalar()
+    finally:
+        db.close()
+    return True
+
+
+def run_warmup():
+    """Warm the database (blocking) while the embedding model initializes in parallel"""
+    if settings.WARMUP_EMBEDDING_MODEL:
+        warmup_state.set("embedding_model", "pending")
+        threading.Thread(
+            target=_run_check,
+            args=("embedding_model", embedding_service.warm_up),
+            name="warmup-embedding",
+            daemon=True
+        ).start()
+
+    for name in WarmupState.REQUIRED_CHECKS:
+        warmup_state.set(name, "pending")
+
+    # Keep retrying while the database is unreachable so readiness recovers on its own
+    delay = 1.0
+    while not (
+        _run_check("database_pool", _warm_pool)
+        and _run_check("representative_queries", _run_representative_queries)
+    ):
+        time.sleep(delay)
+        delay = min(delay * 2, 30.0)
+
+
+def start_warmup():
+    """Run the warm-up in a background thread so the server can bind immediately"""
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark: a borrow storm on one hot title.
+
+Many members borrow and return the same book at once, as when a bestseller
+drops. --concurrency members each run borrow -> hold -> return cycles
+against one inventory row with --copies copies. Run the server with several
+workers (e.g. `hypercorn -w 4 app.main:app`) so requests really race in
+separate processes and database connections. Setup and authentication are
+the same as benchmarks/loadtest.py: same DATABASE_URL and SECRET_KEY as the
+server; members are created and tokens minted locally.
+
+Reported:
+  - cycles/s and borrow/return throughput, p50/p95/p99 latency
+  - outcomes per status (201, 5xx, timeouts) and 400s by reason (no copies,
+    already borrowed)
+  - deadlocks during the run (pg_stat_database) and 5xx responses, which is
+    how serialization failures and lock timeouts surface
+  - invariant violations: borrowed_copies > total_copies or < 0 (sampled
+    every --check-interval-ms while running), duplicate active records for
+    one (user, book), and borrowed_copies not matching the active records
+
+--duplicate-rate makes a fraction of borrows double-submitted concurrently
+by the same member, the usual source of duplicate active records. Exits 1
+if any invariant was violated. Usage:
+    python benchmarks/bench_borrow_contention.py --base-url http://localhost:8000 \\
+        [--concurrency 200] [--copies 10] [--duration 20] [--hold-ms 50] [--duplicate-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import text
+from app.api.auth import create_access_token
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models.models import Book, BookInventory, BorrowRecord, ActiveLoan
+from benchmarks.loadtest import TOKEN_LIFETIME, ensure_users, git_revision, summarize
+
+HOT_BOOK_TITLE = "Contention Benchmark Bestseller"
+
+
+def prepare_hot_book(copies: int) -> int:
+    """Create or reset the hot book: copies in stock, none borrowed, no borrow records or loans"""
+    db = SessionLocal()
+    try:
+        book = db.query(Book).filter(Book.title == HOT_BOOK_TITLE).first()
+        if book is None:
+            book = Book(title=HOT_BOOK_TITLE, author="Benchmark", genre="Fiction", in_circulation=True)
+            db.add(book)
+            db.flush()
+        db.query(BorrowRecord).filter(BorrowRecord.book_id == book.id).delete()
+        db.query(ActiveLoan).filter(ActiveLoan.book_id == book.id).delete()
+
+        inventory = db.query(BookInventory).filter(
+            BookInventory.library_id == settings.DEFAULT_LIBRARY_ID,
+            BookInventory.book_id == book.id
+        ).first()
+        if inventory is None:
+            inventory = BookInventory(library_id=settings.DEFAULT_LIBRARY_ID, book_id=book.id)
+            db.add(inventory)
+        inventory.total_copies = copies
+        inventory.borrowed_copies = 0
+        db.commit()
+        return book.id
+    finally:
+        db.close()
+
+
+def deadlock_count() -> int:
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()"
+        )).scalar()
+
+
+def inventory_sample(book_id: int):
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT total_copies, borrowed_copies FROM book_inventory"
+            " WHERE library_id = :library_id AND book_id = :book_id"
+        ), {"library_id": settings.DEFAULT_LIBRARY_ID, "book_id": book_id}).one()
+
+
+def final_invariants(book_id: int) -> Dict:
+    with engine.connect() as conn:
+        duplicates = conn.execute(text("""
+            SELECT count(*) FROM (
+                SELECT user_id FROM borrow_records
+                WHERE book_id = :book_id AND delete_entry = false
+                GROUP BY user_id HAVING count(*) > 1
+            ) d
+        """), {"book_id": book_id}).scalar()
+        active = conn.execute(text(
+            "SELECT count(*) FROM borrow_records WHERE book_id = :book_id AND delete_entry = false"
+        ), {"book_id": book_id}).scalar()
+        loans = conn.execute(text(
+            "SELECT count(*) FROM active_loans WHERE book_id = :book_id"
+        ), {"book_id": book_id}).scalar()
+    total, borrowed = inventory_sample(book_id)
+    return {
+        "users_with_duplicate_active_records": duplicates,
+        "active_records": active,
+        "active_loans": loans,
+        "borrowed_copies": borrowed,
+        "total_copies": total,
+        "borrowed_copies_matches_active_records": borrowed == active,
+        "active_loans_match_active_records": loans == active,
+    }
+
+
+class Storm:
+    def __init__(self, client: httpx.AsyncClient, book_id: int, args):
+        self.client = client
+        self.book_id = book_id
+        self.args = args
+        self.latencies: Dict[str, List[float]] = {"borrow_book": [], "return_book": []}
+        self.statuses: Dict[str, Dict[str, int]] = {"borrow_book": {}, "return_book": {}}
+        self.rejections: Dict[str, int] = {}
+        self.cycles = 0
+        self.over_capacity_samples = 0
+        self.negative_samples = 0
+        self.samples = 0
+
+    async def call(self, label: str, method: str, url: str, token: str, **kwargs):
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.client.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+            status = str(response.status_code)
+            if response.status_code == 400:
+                detail = f"{label}: {response.json().get('detail')}"
+                self.rejections[detail] = self.rejections.get(detail, 0) + 1
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        self.latencies[label].append(time.perf_counter() - start)
+        counts = self.statuses[label]
+        counts[status] = counts.get(status, 0) + 1
+        return response
+
+    async def member(self, token: str, deadline: float, rng: random.Random):
+        while time.perf_counter() < deadline:
+            borrow = self.call("borrow_book", "POST", "/borrow/", token, json={"book_id": self.book_id})
+            if rng.random() < self.args.duplicate_rate:
+                duplicate = self.call("borrow_book", "POST", "/borrow/", token, json={"book_id": self.book_id})
+                responses = await asyncio.gather(borrow, duplicate)
+            else:
+                responses = [await borrow]
+
+            borrowed = sum(1 for response in responses if response is not None and response.status_code == 201)
+            if borrowed:
+                await asyncio.sleep(self.args.hold_ms / 1000)
+                for _ in range(borrowed):
+                    await self.call("return_book", "POST", f"/borrow/return/{self.book_id}", token)
+                self.cycles += 1
+            else:
+                # No copy: back off briefly like a client retry would
+                await asyncio.sleep(rng.uniform(0, self.args.hold_ms / 1000))
+
+    async def checker(self, deadline: float):
+        while time.perf_counter() < deadline:
+            total, borrowed = await asyncio.to_thread(inventory_sample, self.book_id)
+            self.samples += 1
+            self.over_capacity_samples += borrowed > total
+            self.negative_samples += borrowed < 0
+            await asyncio.sleep(self.args.check_interval_ms / 1000)
+
+
+async def run(args) -> Dict:
+    book_id = prepare_hot_book(args.copies)
+    member_emails, _ = ensure_users(args.concurrency)
+    tokens = [create_access_token({"sub": email}, TOKEN_LIFETIME) for email in member_emails]
+
+    deadlocks_before = deadlock_count()
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        storm = Storm(client, book_id, args)
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            storm.checker(deadline),
+            *(storm.member(token, deadline, random.Random(args.seed + i)) for i, token in enumerate(tokens))
+        )
+        elapsed = time.perf_counter() - start
+    deadlocks = deadlock_count() - deadlocks_before
+
+    invariants = final_invariants(book_id)
+    invariants["over_capacity_samples"] = storm.over_capacity_samples
+    invariants["negative_samples"] = storm.negative_samples
+    invariants["samples"] = storm.samples
+    violated = bool(
+        storm.over_capacity_samples or storm.negative_samples
+        or invariants["users_with_duplicate_active_records"]
+        or not invariants["borrowed_copies_matches_active_records"]
+        or not invariants["active_loans_match_active_records"]
+    )
+
+    endpoints = {
+        label: summarize(storm.latencies[label], storm.statuses[label], elapsed)
+        for label in storm.latencies if storm.latencies[label]
+    }
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "copies": args.copies,
+            "hold_ms": args.hold_ms,
+            "duplicate_rate": args.duplicate_rate,
+            "duration_s": round(elapsed, 2),
+            "seed": args.seed,
+        },
+        "cycles": storm.cycles,
+        "cycles_per_s": round(storm.cycles / elapsed, 2),
+        "endpoints": endpoints,
+        "rejections": dict(sorted(storm.rejections.items())),
+        "deadlocks": deadlocks,
+        "server_errors": sum(stats["errors"] for stats in endpoints.values()),
+        "invariants": invariants,
+        "invariants_violated": violated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=200, help="members hitting the book at once")
+    parser.add_argument("--copies", type=int, default=10, help="total copies of the hot book")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--hold-ms", type=float, default=50, help="how long a member keeps the book")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="fraction of borrows double-submitted")
+    parser.add_argument("--check-interval-ms", type=float, default=50)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="borrow_contention.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print(f"{report['cycles']} borrow/return cycles, {report['cycles_per_s']}/s over {report['meta']['duration_s']}s")
+    for label, stats in report["endpoints"].items():
+        print(f"{label:<12} {stats['requests']:>7} req  {stats['throughput_rps']:>8.1f}/s  "
+              f"p50 {stats['p50_ms']:.1f}  p95 {stats['p95_ms']:.1f}  p99 {stats['p99_ms']:.1f} ms")
+        for status, count in stats["statuses"].items():
+            print(f"{'':<14}{count:>7}  {status}")
+    for detail, count in report["rejections"].items():
+        print(f"{count:>21}  400 {detail}")
+    print(f"deadlocks: {report['deadlocks']}   5xx/transport errors: {report['server_errors']}")
+    print("invariants: " + json.dumps(report["invariants"]))
+    print(f"\nReport written to {args.output}")
+
+    if report["invariants_violated"]:
+        print("INVARIANT VIOLATED")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for the API with per-endpoint percentile reports.
+
+Drives a running server with async httpx workers that pick scenarios from
+benchmarks/loadtest_scenarios.py by weight. Requests are authenticated with
+JWTs minted locally by auth.create_access_token for bench users this script
+creates in the database, so no Google OAuth is involved. Start the server
+with the same DATABASE_URL and SECRET_KEY, and with EMBEDDING_BACKEND=stub so
+semantic search and book creation do not call Vertex AI.
+
+Throughput and p50/p95/p99 latency per endpoint are written to a JSON file
+that can be diffed between commits (--compare prints the deltas). Usage:
+    python benchmarks/loadtest.py --base-url http://localhost:8000 \\
+        [--duration 30] [--warmup 5] [--concurrency 32] [--scenarios list_books,get_book] \\
+        [--min-books 500] [--output loadtest.json] [--compare previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from app.api.auth import create_access_token
+from app.database import SessionLocal
+from app.models.models import Book, User, UserType
+from benchmarks.loadtest_scenarios import GENRES, SCENARIOS
+
+MEMBER_EMAIL = "loadtest-member-{}@example.com"
+LIBRARIAN_EMAIL = "loadtest-librarian@example.com"
+TOKEN_LIFETIME = timedelta(hours=6)
+
+
+def ensure_users(members: int):
+    """Create the bench users if missing and return (member emails, librarian email)"""
+    member_emails = [MEMBER_EMAIL.format(i) for i in range(members)]
+    wanted = {email: UserType.MEMBER for email in member_emails}
+    wanted[LIBRARIAN_EMAIL] = UserType.LIBRARIAN
+
+    db = SessionLocal()
+    try:
+        existing = {email for (email,) in db.query(User.email).filter(User.email.in_(list(wanted)))}
+        for email, user_type in wanted.items():
+            if email not in existing:
+                db.add(User(name=email.split("@")[0], email=email, user_type=user_type))
+        db.commit()
+    finally:
+        db.close()
+    return member_emails, LIBRARIAN_EMAIL
+
+
+def load_book_ids() -> List[int]:
+    db = SessionLocal()
+    try:
+        return [book_id for (book_id,) in db.query(Book.id).filter(Book.in_circulation == True)]
+    finally:
+        db.close()
+
+
+async def seed_books(base_url: str, token: str, count: int, rng: random.Random):
+    """Create books (and inventory) through the API, so embeddings come from the server's backend"""
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60) as client:
+        semaphore = asyncio.Semaphore(16)
+
+        async def create(i: int):
+            async with semaphore:
+                response = await client.post("/books/", json={
+                    "title": f"Loadtest Book {i} {rng.randrange(10 ** 6)}",
+                    "author": f"Author {rng.randrange(500)}",
+                    "genre": rng.choice(GENRES),
+                    "summary": f"A {rng.choice(GENRES)} book used by the load test.",
+                    "year_of_publishing": rng.randrange(1900, 2025),
+                })
+                response.raise_for_status()
+                book_id = response.json()["id"]
+                response = await client.post("/inventory/", json={
+                    "book_id": book_id, "total_copies": rng.randrange(1, 6), "borrowed_copies": 0
+                })
+                response.raise_for_status()
+
+        await asyncio.gather(*(create(i) for i in range(count)))
+
+
+class LoadSession:
+    """Shared state for the workers: tokens, book ids and recorded samples"""
+
+    def __init__(self, client: httpx.AsyncClient, member_tokens: List[str], librarian_token: str, book_ids: List[int]):
+        self.client = client
+        self.member_tokens = member_tokens
+        self.librarian_token = librarian_token
+        self.book_ids = book_ids
+        self.recording = False
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def member_token(self, rng: random.Random) -> str:
+        return rng.choice(self.member_tokens)
+
+    def random_book_id(self, rng: random.Random) -> int:
+        return rng.choice(self.book_ids)
+
+    async def request(self, label: str, method: str, url: str, token: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.client.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        elapsed = time.perf_counter() - start
+
+        if self.recording:
+            self.latencies.setdefault(label, []).append(elapsed)
+            counts = self.statuses.setdefault(label, {})
+            counts[status] = counts.get(status, 0) + 1
+        return response
+
+
+async def worker(session: LoadSession, scenarios, deadline: float, rng: random.Random):
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        await scenarios[name][1](session, rng)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], duration: float) -> Dict:
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or status.startswith("5"))
+    return {
+        "requests": len(values),
+        "throughput_rps": round(len(values) / duration, 2),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: Dict, previous: Optional[Dict]):
+    header = f"{'endpoint':<24}{'req':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>6}"
+    print(header)
+    print("-" * len(header))
+    for label, stats in report["endpoints"].items():
+        line = (f"{label:<24}{stats['requests']:>8}{stats['throughput_rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['errors']:>6}")
+        old = (previous or {}).get("endpoints", {}).get(label)
+        if old:
+            deltas = [
+                f"{key.split('_')[0]} {(stats[key] - old[key]) / old[key] * 100:+.0f}%"
+                for key in ("throughput_rps", "p50_ms", "p99_ms") if old[key]
+            ]
+            line += "   vs previous: " + ", ".join(deltas)
+        print(line)
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    scenarios = SCENARIOS
+    if args.scenarios:
+        unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+        if unknown:
+            raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = {name: SCENARIOS[name] for name in args.scenarios.split(",")}
+
+    member_emails, librarian_email = ensure_users(args.users)
+    member_tokens = [create_access_token({"sub": email}, TOKEN_LIFETIME) for email in member_emails]
+    librarian_token = create_access_token({"sub": librarian_email}, TOKEN_LIFETIME)
+
+    book_ids = load_book_ids()
+    if len(book_ids) < args.min_books:
+        print(f"Seeding {args.min_books - len(book_ids)} books through the API...")
+        await seed_books(args.base_url, librarian_token, args.min_books - len(book_ids), rng)
+        book_ids = load_book_ids()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        session = LoadSession(client, member_tokens, librarian_token, book_ids)
+
+        start = time.perf_counter()
+        deadline = start + args.warmup + args.duration
+        workers = [
+            asyncio.create_task(worker(session, scenarios, deadline, random.Random(args.seed + i + 1)))
+            for i in range(args.concurrency)
+        ]
+
+        await asyncio.sleep(args.warmup)
+        session.recording = True
+        measure_start = time.perf_counter()
+        await asyncio.gather(*workers)
+        measured = time.perf_counter() - measure_start
+
+    endpoints = {
+        label: summarize(session.latencies[label], session.statuses[label], measured)
+        for label in sorted(session.latencies)
+    }
+    all_latencies = [value for values in session.latencies.values() for value in values]
+    all_statuses: Dict[str, int] = {}
+    for counts in session.statuses.values():
+        for status, count in counts.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "duration_s": round(measured, 2),
+            "warmup_s": args.warmup,
+            "seed": args.seed,
+            "books": len(book_ids),
+            "scenarios": {name: weight for name, (weight, _) in scenarios.items()},
+        },
+        "endpoints": endpoints,
+        "total": summarize(all_latencies, all_statuses, measured) if all_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before recording")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent workers (and connections)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--users", type=int, default=50, help="bench member accounts to spread requests over")
+    parser.add_argument("--min-books", type=int, default=500, help="seed books through the API if fewer exist")
+    parser.add_argument("--scenarios", help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="loadtest.json")
+    parser.add_argument("--compare", help="previous report to print deltas against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
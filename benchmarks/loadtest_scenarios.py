@@ -0,0 +1,65 @@
+"""
+Scenario definitions for benchmarks/loadtest.py.
+
+Each scenario is an async function taking (session, rng) that issues one or
+more requests through session.request(label, ...). The label is the endpoint
+name the latency is reported under. SCENARIOS maps scenario names to
+(weight, function); the weights give the default read-heavy mix.
+"""
+
+import random
+
+GENRES = ["fiction", "history", "science", "poetry", "biography", "fantasy", "mystery", "romance"]
+
+# Combined into ~1000 distinct queries, so the query-embedding cache sees misses too
+QUERY_ADJECTIVES = ["quiet", "epic", "dark", "funny", "short", "classic", "modern", "strange", "hopeful", "tragic"]
+QUERY_SUBJECTS = ["war", "love", "space", "the sea", "family", "a detective", "dragons", "a city", "exile", "childhood"]
+QUERY_FORMS = ["novel", "memoir", "story", "history", "poem", "saga", "thriller", "essay", "fable", "chronicle"]
+
+SEARCH_TERMS = ["the", "of", "a", "book", "night", "war", "love", "house", "man", "world"]
+
+
+async def list_books(session, rng: random.Random):
+    params = {"skip": rng.randrange(0, 500), "limit": 100}
+    if rng.random() < 0.3:
+        params["genre"] = rng.choice(GENRES)
+    await session.request("list_books", "GET", "/books/", session.member_token(rng), params=params)
+
+
+async def search_books(session, rng: random.Random):
+    term = rng.choice(SEARCH_TERMS)
+    params = {"title": term, "author": term, "limit": 50}
+    await session.request("search_books", "GET", "/books/search/", session.member_token(rng), params=params)
+
+
+async def semantic_search_books(session, rng: random.Random):
+    query = f"{rng.choice(QUERY_ADJECTIVES)} {rng.choice(QUERY_FORMS)} about {rng.choice(QUERY_SUBJECTS)}"
+    params = {"query": query, "limit": 10}
+    await session.request("semantic_search_books", "GET", "/books/semantic-search/", session.member_token(rng), params=params)
+
+
+async def get_book(session, rng: random.Random):
+    book_id = session.random_book_id(rng)
+    await session.request("get_book", "GET", f"/books/{book_id}", session.member_token(rng))
+
+
+async def borrow_and_return(session, rng: random.Random):
+    token = session.member_token(rng)
+    book_id = session.random_book_id(rng)
+    response = await session.request("borrow_book", "POST", "/borrow/", token, json={"book_id": book_id})
+    if response is not None and response.status_code == 201:
+        await session.request("return_book", "POST", f"/borrow/return/{book_id}", token)
+
+
+async def librarian_stats(session, rng: random.Random):
+    await session.request("stats", "GET", "/stats/librarian", session.librarian_token)
+
+
+SCENARIOS = {
+    "list_books": (30, list_books),
+    "search_books": (15, search_books),
+    "semantic_search_books": (10, semantic_search_books),
+    "get_book": (25, get_book),
+    "borrow_and_return": (15, borrow_and_return),
+    "stats": (5, librarian_stats),
+}
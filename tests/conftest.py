@@ -0,0 +1,9 @@
+import os
+
+# Settings are read at import time; the tests run against SQLite and never reach Google
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("EMBEDDING_BACKEND", "stub")
+os.environ.setdefault("WARMUP_EMBEDDING_MODEL", "false")
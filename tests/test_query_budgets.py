@@ -0,0 +1,131 @@
+"""
+Route query budgets: list and search must issue a fixed number of statements
+whatever the page size, so an N+1 regression fails here instead of only
+logging a warning in production.
+"""
+
+import pytest
+from jose import jwt
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+from app.api.books import list_books, search_books
+from app.config import settings
+from app.dependencies.auth import get_current_user
+from app.models.models import ActiveLoan, Book, BookEmbedding, BookInventory, Library, User, UserProfile, UserType
+from app.observability.queries import ROUTE_QUERY_BUDGETS, assert_query_budget
+from app.services.embedding_service import embedding_service
+
+BOOK_COUNT = 150
+
+
+@pytest.fixture(scope="module")
+def db():
+    # Copy just the tables these endpoints touch: SQLite cannot create the
+    # partitioned ones with a composite primary key plus autoincrement
+    metadata = MetaData()
+    for model in (Library, User, Book, BookInventory, ActiveLoan, BookEmbedding, UserProfile):
+        table = model.__table__.to_metadata(metadata)
+        for column in table.primary_key.columns:
+            column.autoincrement = False
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    session.add(Library(id=settings.DEFAULT_LIBRARY_ID, name="Main"))
+    session.add(User(id=1, name="Member", email="member@example.com", user_type=UserType.MEMBER))
+    for book_id in range(1, BOOK_COUNT + 1):
+        session.add(Book(id=book_id, title=f"Book {book_id}", author=f"Author {book_id % 7}", genre="Fiction"))
+        session.add(BookInventory(
+            id=book_id,
+            library_id=settings.DEFAULT_LIBRARY_ID,
+            book_id=book_id,
+            total_copies=3,
+            borrowed_copies=book_id % 3
+        ))
+    for book_id in range(1, BOOK_COUNT + 1, 10):
+        session.add(ActiveLoan(library_id=settings.DEFAULT_LIBRARY_ID, user_id=1, book_id=book_id))
+    for book_id in range(1, BOOK_COUNT + 1):
+        session.add(BookEmbedding(
+            book_id=book_id,
+            model=embedding_service.model_name,
+            dim=4,
+            content_hash=str(book_id),
+            vector=[book_id % 10, 1, 0, 0]
+        ))
+    session.add(UserProfile(user_id=1, model=embedding_service.model_name, vector=[1, 0, 0, 0], weight=1.0))
+    session.commit()
+
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def http_request():
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+
+
+def _current_user(db):
+    token = jwt.encode({"sub": "member@example.com"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return get_current_user(token=token, db=db)
+
+
+@pytest.mark.parametrize("limit", [1, 100])
+def test_list_books_within_budget(db, http_request, limit):
+    with assert_query_budget(ROUTE_QUERY_BUDGETS[("GET", "/books/")]) as request_context:
+        user = _current_user(db)
+        response = list_books(http_request, skip=0, limit=limit, genre=None, fields=None, db=db, current_user=user)
+
+    assert response.status_code == 200
+    assert request_context.db_queries > 0
+
+
+@pytest.mark.parametrize("limit", [1, 100])
+def test_search_books_within_budget(db, http_request, limit):
+    with assert_query_budget(ROUTE_QUERY_BUDGETS[("GET", "/books/search/")]) as request_context:
+        user = _current_user(db)
+        response = search_books(
+            http_request,
+            title="Book",
+            author=None,
+            skip=0,
+            limit=limit,
+            fields=None,
+            personalize=False,
+            db=db,
+            current_user=user
+        )
+
+    assert response.status_code == 200
+    assert request_context.db_queries > 0
+
+
+@pytest.mark.parametrize("skip", [0, 45, 60])
+def test_personalized_search_within_budget(db, http_request, monkeypatch, skip):
+    # Window of 50 matches: a page inside it, one crossing into the continuation, one past it
+    monkeypatch.setattr(settings, "PERSONALIZATION_TEXT_CANDIDATES", 50)
+    with assert_query_budget(ROUTE_QUERY_BUDGETS[("GET", "/books/search/")]):
+        user = _current_user(db)
+        response = search_books(
+            http_request,
+            title="Book",
+            author=None,
+            skip=skip,
+            limit=10,
+            fields=None,
+            personalize=True,
+            db=db,
+            current_user=user
+        )
+
+    assert response.status_code == 200
+
+
+def test_budget_exceeded_raises(db):
+    with pytest.raises(AssertionError, match="budget is 1"):
+        with assert_query_budget(1):
+            for _ in range(2):
+                db.query(Book.id).first()
@@ -0,0 +1,49 @@
+"""
+Query-plan regressions: the scenarios of benchmarks/check_query_plans.py,
+run against a seeded Postgres (pgvector required) so a hot statement that
+loses its index fails here.
+
+Skipped unless PLAN_CHECK_DATABASE_URL is set; the database gets a scratch
+plan_check schema, dropped afterwards.
+"""
+
+import os
+import pytest
+from sqlalchemy.orm import Session
+
+PLAN_CHECK_DATABASE_URL = os.environ.get("PLAN_CHECK_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(
+    not PLAN_CHECK_DATABASE_URL,
+    reason="PLAN_CHECK_DATABASE_URL is not set (Postgres with pgvector)"
+)
+
+from benchmarks.check_query_plans import (  # noqa: E402
+    SCENARIOS, check_scenario, drop_schema, format_plans, plan_check_engine, scenario_inputs, setup_schema
+)
+
+
+@pytest.fixture(scope="module")
+def plan_check():
+    engine = plan_check_engine(PLAN_CHECK_DATABASE_URL)
+    setup_schema(engine)
+    connection = engine.connect()
+    transaction = connection.begin()
+    # Endpoint commits become savepoint releases; everything is rolled back at the end
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session, scenario_inputs(session)
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+        drop_schema(engine)
+        engine.dispose()
+
+
+# In order: return_book returns the book borrow_book borrowed
+@pytest.mark.parametrize("name, call, checks", SCENARIOS, ids=[scenario[0] for scenario in SCENARIOS])
+def test_query_plan(plan_check, name, call, checks):
+    session, inputs = plan_check
+    problems, plans = check_scenario(session, inputs, call, checks)
+    assert not problems, f"{name}: {'; '.join(problems)}\n" + "\n".join(format_plans(plans))
@@ -0,0 +1,20 @@
+import pytest
+from starlette.requests import Request
+from app.responses import COLUMNAR_JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, negotiate_media_type
+
+
+def _request(accept: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"accept", accept.encode())], "query_string": b""})
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", "application/json"),
+    ("application/json, application/msgpack;q=0.1", "application/json"),
+    ("application/msgpack", MSGPACK_MEDIA_TYPE),
+    ("application/json;q=0.5, application/msgpack", MSGPACK_MEDIA_TYPE),
+    (f"{COLUMNAR_JSON_MEDIA_TYPE}, */*;q=0.1", COLUMNAR_JSON_MEDIA_TYPE),
+    ("text/html,application/xhtml+xml,*/*;q=0.8", "application/json"),
+    ("application/msgpack;q=0", "application/json"),
+])
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(_request(accept)) == expected